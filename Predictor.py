@@ -4,29 +4,236 @@
 # In[ ]:
 
 
-from flask import Flask, request, render_template_string
+from flask import Flask, request, render_template, jsonify, Response, stream_with_context, url_for
+import json
+import math
+import os
+from urllib.parse import urlencode
+import numpy as np
 import pandas as pd
-import joblib
-import matplotlib.pyplot as plt
-import io
-import base64
-
-# Load Calories Burned Prediction model
-model = joblib.load("prediction_utils/calories_burned_model.pkl")
-feature_cols = joblib.load("prediction_utils/feature_columns.pkl")
-encoders = {col: joblib.load(f"prediction_utils/{col}_encoder.pkl") for col in ["BMI_Category", "Fitness_Level"]}
-
-# Load macronutrient model and encoders
-macros_model = joblib.load("prediction_utils/macros_model.pkl")
-macros_features = joblib.load("prediction_utils/macros_feature_columns.pkl")  # <-- Fixed this line
-macro_encoders = {
-    col: joblib.load(f"prediction_utils/{col}_encoder.pkl")
-    for col in ["Meal_Type", "Diet_Type", "BMI_Category"]
-}
+from artifacts import LazyArtifacts
+from batching import BATCH_SIZE, BATCH_WAIT_MS, MicroBatcher
+from flat_forest import FLAT_MAX_ROWS, load_model, model_version
+from cache import LRUCache
+from features import load_feature_pipeline
+from charts import (
+    CHART_CACHE_SIZE, CHART_FORMAT, CHART_FORMATS, CHART_MIMETYPES, CHART_WORKERS, CHARTS,
+    ChartService, chart_etag, chart_html, chart_key,
+)
+from compression import init_compression, matching_etag
+from calorie_grid import CALORIE_FORM_OPTIONS, load_calorie_grid
+
+# Models and feature pipelines are loaded on first use (see artifacts.py), so the
+# form pages are served without waiting for the forests to unpickle. Batches
+# of up to FLAT_MAX_ROWS rows (single forms, the micro-batcher) are predicted
+# with the flat-array exports from flat_forest.py when present, larger ones
+# (the API) with sklearn.
+flat_max_rows = int(os.environ.get("FLAT_MAX_ROWS", FLAT_MAX_ROWS))
+artifacts = LazyArtifacts({
+    # Calories Burned Prediction model
+    "model": lambda: load_model("calories_burned_model", max_flat_rows=flat_max_rows),
+    "features": lambda: load_feature_pipeline("calories_burned_model"),
+
+    # Macronutrient model and feature pipeline
+    "macros_model": lambda: load_model("macros_model", max_flat_rows=flat_max_rows),
+    "macros_version": lambda: model_version("macros_model"),
+    "macro_features": lambda: load_feature_pipeline("macros_model"),
+
+    # Calories model output for every form input (calorie_grid.py), or None
+    "calorie_grid": load_calorie_grid,
+})
+
+# Concurrent requests share one model.predict() call per batch (see batching.py)
+batch_size = int(os.environ.get("PREDICT_BATCH_SIZE", BATCH_SIZE))
+batch_wait_ms = float(os.environ.get("PREDICT_BATCH_WAIT_MS", BATCH_WAIT_MS))
+calories_batcher = MicroBatcher(lambda rows: artifacts.get("model").predict(rows), batch_size, batch_wait_ms)
+macros_batcher = MicroBatcher(lambda rows: artifacts.get("macros_model").predict(rows), batch_size, batch_wait_ms)
+
+# Macro predictions and their summary, memoized by model version and inputs.
+# Calories are rounded to MACROS_CALORIE_STEP before predicting (0 keeps
+# them as submitted), so cached and fresh answers are always the same.
+macros_cache = LRUCache(int(os.environ.get("MACROS_CACHE_SIZE", 1024)))
+macros_calorie_step = float(os.environ.get("MACROS_CALORIE_STEP", 0.01))
+# The models compare their inputs as float32
+MAX_CALORIES = float(np.finfo(np.float32).max)
+
+
+def quantize_calories(cal):
+    # inf, nan and values the models cannot represent are invalid input (and
+    # would overflow round())
+    if not abs(cal) <= MAX_CALORIES:
+        raise ValueError(f"Calories (kcal) out of range: {cal}")
+    if macros_calorie_step <= 0:
+        return cal
+    return round(round(cal / macros_calorie_step) * macros_calorie_step, 6)
+
+
+def calories_summary(prediction):
+    # Interpreted summary based on predicted value
+    if prediction < 0.2:
+        return "Very low calorie burn — consider increasing exercise intensity or duration."
+    elif prediction < 0.5:
+        return "Moderate calorie burn — suitable for light workouts or warmups."
+    elif prediction < 0.8:
+        return "High calorie burn — ideal for improving stamina and fitness."
+    else:
+        return "Very high calorie burn — excellent for intense fat-burning workouts."
+
+
+def macros_result(output):
+    prediction = {
+        "Protein (g)": round(float(output[0]), 2),
+        "Carbohydrates (g)": round(float(output[1]), 2),
+        "Fat (g)": round(float(output[2]), 2),
+    }
+
+    # Add an interpreted summary
+    main_macro = max(prediction, key=prediction.get)
+    summary = f"This meal is primarily composed of {main_macro.lower()}, making it suitable for those needing higher {main_macro.lower()} intake."
+    return prediction, summary
+
+
+def predict_macros_summary(cal, meal, diet, bmi_cat):
+    cal = quantize_calories(cal)
+    key = (artifacts.get("macros_version"), cal, meal, diet, bmi_cat)
+    cached = macros_cache.get(key)
+    if cached is not None:
+        return cached
+
+    encoded = artifacts.get("macro_features").encode_row({
+        "Calories (kcal)": cal, "Meal_Type": meal, "Diet_Type": diet, "BMI_Category": bmi_cat,
+    })
+
+    prediction, summary = macros_result(macros_batcher.predict(encoded))
+    macros_cache.put(key, (prediction, summary))
+    return prediction, summary
+
+
+def exercise_plan(goal, time):
+    # Rule-based suggestions
+    if goal == "Weight Loss":
+        suggestion = {
+            "Cardio": round(time * 0.5, 1),
+            "HIIT": round(time * 0.3, 1),
+            "Strength": round(time * 0.2, 1),
+        }
+        tip = "Stay hydrated and focus on consistency. Mix HIIT with light cardio for max burn."
+
+    elif goal == "Muscle Gain":
+        suggestion = {
+            "Strength": round(time * 0.6, 1),
+            "HIIT": round(time * 0.2, 1),
+            "Flexibility": round(time * 0.2, 1),
+        }
+        tip = "Progressive overload is key. Ensure proper protein intake post-workout."
+
+    elif goal == "Flexibility":
+        suggestion = {
+            "Flexibility": round(time * 0.6, 1),
+            "Cardio": round(time * 0.3, 1),
+            "Strength": round(time * 0.1, 1),
+        }
+        tip = "Stretch daily. Focus on breathwork to enhance flexibility routines."
+
+    else:  # General Fitness
+        suggestion = {
+            "Cardio": round(time * 0.35, 1),
+            "Strength": round(time * 0.35, 1),
+            "Flexibility": round(time * 0.2, 1),
+            "HIIT": round(time * 0.1, 1),
+        }
+        tip = "A balanced routine with rest days ensures sustainable progress."
+
+    return suggestion, tip
+
+
+# Charts are rendered off pyplot in a small worker pool and cached by their
+# rounded values (see charts.py). Pages link to them by a URL made of those
+# values, and /charts/ answers with an ETag computed from the same values.
+charts = ChartService(
+    int(os.environ.get("CHART_WORKERS", CHART_WORKERS)), int(os.environ.get("CHART_CACHE_SIZE", CHART_CACHE_SIZE))
+)
+default_chart_format = os.environ.get("CHART_FORMAT", CHART_FORMAT)
+CHART_MAX_AGE = int(os.environ.get("CHART_MAX_AGE", 86400))
+CHART_MAX_VALUES = 8
+
+
+def chart_format():
+    # SVG unless PNG is asked for with ?chart=png (or CHART_FORMAT=png)
+    fmt = request.args.get("chart", default_chart_format)
+    return fmt if fmt in CHART_FORMATS else CHART_FORMAT
+
+
+def chart_url(kind, values, fmt):
+    # Start rendering now, so the chart is usually cached by the time the
+    # browser asks for it
+    charts.submit(kind, values, fmt)
+    _, _, rounded = chart_key(kind, values, fmt)
+    return url_for("chart_image", kind=kind, fmt=fmt) + "?" + urlencode(rounded)
+
 
 # Flask setup
 app = Flask(__name__)
 
+# HTML, JSON and SVG responses are gzip/brotli compressed (see compression.py)
+init_compression(app)
+
+# Set WARMUP=1 to load every artifact in a background thread at startup
+if os.environ.get("WARMUP") == "1":
+    artifacts.warmup(background=True)
+
+
+@app.route("/ready")
+def ready():
+    # Probes must not depend on traffic to load the artifacts, so a probe
+    # that finds them pending starts the background warmup (once at a time)
+    status = artifacts.status()
+    if not status["ready"]:
+        artifacts.warmup(background=True)
+    return jsonify(status), 200 if status["ready"] else 503
+
+
+@app.route("/stats")
+def stats():
+    return jsonify({
+        "calories_batcher": calories_batcher.stats(),
+        "macros_batcher": macros_batcher.stats(),
+        "macros_cache": macros_cache.stats(),
+        "chart_cache": charts.stats(),
+    })
+
+
+@app.route("/charts/<kind>.<fmt>")
+def chart_image(kind, fmt):
+    if kind not in CHARTS or fmt not in CHART_FORMATS:
+        return jsonify({"error": "Unknown chart"}), 404
+    try:
+        values = {label: float(value) for label, value in request.args.items()}
+    except ValueError:
+        values = None
+    if not values or len(values) > CHART_MAX_VALUES or not all(map(math.isfinite, values.values())):
+        return jsonify({"error": "Invalid chart values"}), 400
+
+    # Compressed SVGs carry the ETag with their encoding appended (see
+    # compression.py), and revalidate with it
+    etag = chart_etag(kind, values, fmt)
+    matched = matching_etag(etag, request.if_none_match)
+    if matched is not None:
+        response = Response(status=304)
+        etag = matched
+    else:
+        try:
+            response = Response(charts.render(kind, values, fmt), mimetype=CHART_MIMETYPES[fmt])
+        except ValueError:
+            return jsonify({"error": "Invalid chart values"}), 400
+
+    # The URL fixes the image, so it can be cached for CHART_MAX_AGE seconds
+    # and revalidated by ETag after that
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = CHART_MAX_AGE
+    return response
+
 
 # In[ ]:
 
@@ -158,61 +365,33 @@ HTML_TEMPLATE = """
 </html>
 """
 
+# The page template is compiled once; render_template() accepts the compiled
+# template and still applies Flask's context processors. Each route's form is
+# a constant fragment built below, so a request only renders its result.
+PAGE_TEMPLATE = app.jinja_env.from_string(HTML_TEMPLATE)
 
-# In[ ]:
 
+def render_page(page_title, heading, content):
+    return render_template(PAGE_TEMPLATE, page_title=page_title, heading=heading, content=content)
 
-@app.route("/", methods=["GET", "POST"])
-def predict_calories():
-    prediction = None
-    error = None
-    summary = None
-    result_html = ""
 
-    durations = [round(i / 20, 2) for i in range(1, 21)]
-    heart_rates = [round(i / 20, 2) for i in range(1, 21)]
+def options_html(values, quote='"'):
+    return "".join(f"<option value={quote}{value}{quote}>{value}</option>" for value in values)
 
-    intensity_options = "".join([f'<option value="{i}">{i}</option>' for i in range(1, 11)])
-    duration_options = "".join([f'<option value="{val}">{val}</option>' for val in durations])
-    heart_rate_options = "".join([f'<option value="{val}">{val}</option>' for val in heart_rates])
 
-    if request.method == "POST":
-        try:
-            data = {col: request.form[col] for col in feature_cols}
-            input_data = []
-
-            for col in feature_cols:
-                if col in encoders:
-                    val = encoders[col].transform([data[col]])[0]
-                else:
-                    val = float(data[col])
-                input_data.append(val)
-
-            prediction = round(model.predict([input_data])[0], 2)
-
-            # Add an interpreted summary based on predicted value
-            if prediction < 0.2:
-                summary = "Very low calorie burn — consider increasing exercise intensity or duration."
-            elif prediction < 0.5:
-                summary = "Moderate calorie burn — suitable for light workouts or warmups."
-            elif prediction < 0.8:
-                summary = "High calorie burn — ideal for improving stamina and fitness."
-            else:
-                summary = "Very high calorie burn — excellent for intense fat-burning workouts."
-
-        except Exception:
-            error = "Invalid input. Please check your values."
+# In[ ]:
 
-    form_html = f"""
+
+CALORIES_FORM_HTML = f"""
         <form method="POST">
             <label>Exercise Intensity (1–10):</label>
-            <select name="Exercise Intensity" required>{intensity_options}</select>
+            <select name="Exercise Intensity" required>{options_html(CALORIE_FORM_OPTIONS["Exercise Intensity"])}</select>
 
             <label>Duration (0 to 1):</label>
-            <select name="Duration">{duration_options}</select>
+            <select name="Duration">{options_html(CALORIE_FORM_OPTIONS["Duration"])}</select>
 
             <label>Heart Rate (0 to 1):</label>
-            <select name="Heart Rate">{heart_rate_options}</select>
+            <select name="Heart Rate">{options_html(CALORIE_FORM_OPTIONS["Heart Rate"])}</select>
 
             <label>BMI Category:</label>
             <select name="BMI_Category" required>
@@ -233,6 +412,35 @@ def predict_calories():
         </form>
     """
 
+
+@app.route("/", methods=["GET", "POST"])
+def predict_calories():
+    prediction = None
+    error = None
+    summary = None
+    result_html = ""
+    form_html = CALORIES_FORM_HTML
+
+    if request.method == "POST":
+        # Loaded outside the try: a model folder that fails to load is a
+        # server error, not invalid input
+        features = artifacts.get("features")
+        calorie_grid = artifacts.get("calorie_grid")
+        try:
+            data = {col: request.form[col] for col in features.feature_cols}
+
+            # Form inputs are precomputed; anything else goes to the model
+            prediction = calorie_grid.lookup(data) if calorie_grid is not None else None
+
+            if prediction is None:
+                prediction = calories_batcher.predict(features.encode_row(data))
+
+            prediction = round(prediction, 2)
+            summary = calories_summary(prediction)
+
+        except (KeyError, ValueError):
+            error = "Invalid input. Please check your values."
+
     if prediction is not None:
         result_html = f"<div class='result'>Predicted Calories Burned: <strong>{prediction}</strong>"
         if summary:
@@ -242,8 +450,7 @@ def predict_calories():
     if error:
         form_html += f"<div class='error'>{error}</div>"
 
-    return render_template_string(
-        HTML_TEMPLATE,
+    return render_page(
         page_title="Calories Burned | Health & Fitness AI",
         heading="Calories Burned Prediction",
         content=form_html + result_html
@@ -253,13 +460,7 @@ def predict_calories():
 # In[ ]:
 
 
-@app.route("/macros", methods=["GET", "POST"])
-def predict_macros():
-    prediction = None
-    chart_base64 = None
-    error = None
-
-    form_html = """
+MACROS_FORM_HTML = """
     <form method="POST">
         <label>Calories (kcal):</label>
         <input type="number" name="Calories (kcal)" step="0.01" required>
@@ -292,52 +493,31 @@ def predict_macros():
     </form>
     """
 
+
+@app.route("/macros", methods=["GET", "POST"])
+def predict_macros():
+    prediction = None
+    chart = None
+    error = None
+
+    form_html = MACROS_FORM_HTML
+
     if request.method == "POST":
+        # Loaded outside the try, as in predict_calories()
+        artifacts.get("macro_features")
+        artifacts.get("macros_version")
         try:
             cal = float(request.form["Calories (kcal)"])
             meal = request.form["Meal_Type"]
             diet = request.form["Diet_Type"]
             bmi_cat = request.form["BMI_Category"]
 
-            encoded = [
-                cal,
-                macro_encoders["Meal_Type"].transform([meal])[0],
-                macro_encoders["Diet_Type"].transform([diet])[0],
-                macro_encoders["BMI_Category"].transform([bmi_cat])[0],
-            ]
-
-            output = macros_model.predict([encoded])[0]
-            prediction = {
-                "Protein (g)": round(output[0], 2),
-                "Carbohydrates (g)": round(output[1], 2),
-                "Fat (g)": round(output[2], 2),
-            }
-
-            # Add an interpreted summary
-            main_macro = max(prediction, key=prediction.get)
-            summary = f"This meal is primarily composed of {main_macro.lower()}, making it suitable for those needing higher {main_macro.lower()} intake."
-
-            # Create donut chart
-            labels = list(prediction.keys())
-            values = list(prediction.values())
-            fig, ax = plt.subplots(figsize=(6, 6), facecolor='none')
-            colors = ['#00cc99', '#00bfff', '#ff9966']
-            wedges, texts, autotexts = ax.pie(
-                values, labels=labels, autopct='%1.1f%%', startangle=90,
-                colors=colors, textprops={'color': 'white', 'fontsize': 12},
-                wedgeprops={'edgecolor': 'white'}
-            )
-            centre_circle = plt.Circle((0, 0), 0.60, fc='black')
-            fig.gca().add_artist(centre_circle)
-            ax.axis('equal')
-            plt.tight_layout()
-            buf = io.BytesIO()
-            plt.savefig(buf, format='png', bbox_inches='tight', transparent=True)
-            buf.seek(0)
-            chart_base64 = base64.b64encode(buf.read()).decode('utf-8')
-            buf.close()
-
-        except Exception:
+            prediction, summary = predict_macros_summary(cal, meal, diet, bmi_cat)
+
+            # Donut chart, served from /charts/
+            chart = chart_url("macros_donut", prediction, chart_format())
+
+        except (KeyError, ValueError):
             error = "Invalid input. Please check your values."
 
     result_html = ""
@@ -348,19 +528,16 @@ def predict_macros():
         result_html += "</ul>"
 
         # Summary line
-        main_macro = max(prediction, key=prediction.get)
-        summary = f"This meal is primarily composed of {main_macro.lower()}, making it suitable for those needing higher {main_macro.lower()} intake."
         result_html += f"<p style='margin-top:10px; font-style: italic; color: #ffcc99;'>{summary}</p>"
 
         # Add chart
-        result_html += f'<img src="data:image/png;base64,{chart_base64}" alt="Macronutrient Chart" style="margin-top: 10px;" />'
+        result_html += chart_html(chart, "Macronutrient Chart", "margin-top: 10px;")
         result_html += "</div>"
 
     if error:
         result_html += f"<div class='error'>{error}</div>"
 
-    return render_template_string(
-        HTML_TEMPLATE,
+    return render_page(
         page_title="Macronutrient Prediction | Health & Fitness AI",
         heading="Macronutrient Distribution Prediction",
         content=form_html + result_html
@@ -370,44 +547,48 @@ def predict_macros():
 # In[ ]:
 
 
-@app.route("/exercise", methods=["GET", "POST"])
-def suggest_exercise():
-    suggestion = None
-    chart_base64 = None
-    tip = None
-    error = None
-
-    bmi_options = ["Underweight", "Normal", "Overweight", "Obese"]
-    fitness_levels = ["Beginner", "Intermediate", "Advanced"]
-    workout_types = ["Cardio", "Strength", "Flexibility", "HIIT"]
-    goals = ["Weight Loss", "Muscle Gain", "Flexibility", "General Fitness"]
-    genders = ["Male", "Female", "Other"]
-    times = list(range(15, 100, 15))
+EXERCISE_FORM_OPTIONS = {
+    "BMI_Category": ["Underweight", "Normal", "Overweight", "Obese"],
+    "Fitness_Level": ["Beginner", "Intermediate", "Advanced"],
+    "Workout_Preference": ["Cardio", "Strength", "Flexibility", "HIIT"],
+    "Time": list(range(15, 100, 15)),
+    "Goal": ["Weight Loss", "Muscle Gain", "Flexibility", "General Fitness"],
+    "Gender": ["Male", "Female", "Other"],
+}
 
-    form_html = """
+EXERCISE_FORM_HTML = """
     <form method="POST">
         <label>BMI Category:</label>
-        <select name="BMI_Category">""" + "".join([f"<option value='{opt}'>{opt}</option>" for opt in bmi_options]) + """</select>
+        <select name="BMI_Category">""" + options_html(EXERCISE_FORM_OPTIONS["BMI_Category"], "'") + """</select>
 
         <label>Fitness Level:</label>
-        <select name="Fitness_Level">""" + "".join([f"<option value='{opt}'>{opt}</option>" for opt in fitness_levels]) + """</select>
+        <select name="Fitness_Level">""" + options_html(EXERCISE_FORM_OPTIONS["Fitness_Level"], "'") + """</select>
 
         <label>Workout Preference:</label>
-        <select name="Workout_Preference">""" + "".join([f"<option value='{opt}'>{opt}</option>" for opt in workout_types]) + """</select>
+        <select name="Workout_Preference">""" + options_html(EXERCISE_FORM_OPTIONS["Workout_Preference"], "'") + """</select>
 
         <label>Time Available (minutes):</label>
-        <select name="Time">""" + "".join([f"<option value='{t}'>{t}</option>" for t in times]) + """</select>
+        <select name="Time">""" + options_html(EXERCISE_FORM_OPTIONS["Time"], "'") + """</select>
 
         <label>Fitness Goal:</label>
-        <select name="Goal">""" + "".join([f"<option value='{g}'>{g}</option>" for g in goals]) + """</select>
+        <select name="Goal">""" + options_html(EXERCISE_FORM_OPTIONS["Goal"], "'") + """</select>
 
         <label>Gender:</label>
-        <select name="Gender">""" + "".join([f"<option value='{g}'>{g}</option>" for g in genders]) + """</select>
+        <select name="Gender">""" + options_html(EXERCISE_FORM_OPTIONS["Gender"], "'") + """</select>
 
         <button type="submit">Get Suggestion</button>
     </form>
     """
 
+
+@app.route("/exercise", methods=["GET", "POST"])
+def suggest_exercise():
+    suggestion = None
+    chart = None
+    tip = None
+    error = None
+    form_html = EXERCISE_FORM_HTML
+
     if request.method == "POST":
         try:
             bmi = request.form["BMI_Category"]
@@ -418,57 +599,10 @@ def suggest_exercise():
             gender = request.form["Gender"]
 
             # Rule-based suggestions
-            if goal == "Weight Loss":
-                suggestion = {
-                    "Cardio": round(time * 0.5, 1),
-                    "HIIT": round(time * 0.3, 1),
-                    "Strength": round(time * 0.2, 1),
-                }
-                tip = "Stay hydrated and focus on consistency. Mix HIIT with light cardio for max burn."
-
-            elif goal == "Muscle Gain":
-                suggestion = {
-                    "Strength": round(time * 0.6, 1),
-                    "HIIT": round(time * 0.2, 1),
-                    "Flexibility": round(time * 0.2, 1),
-                }
-                tip = "Progressive overload is key. Ensure proper protein intake post-workout."
-
-            elif goal == "Flexibility":
-                suggestion = {
-                    "Flexibility": round(time * 0.6, 1),
-                    "Cardio": round(time * 0.3, 1),
-                    "Strength": round(time * 0.1, 1),
-                }
-                tip = "Stretch daily. Focus on breathwork to enhance flexibility routines."
-
-            else:  # General Fitness
-                suggestion = {
-                    "Cardio": round(time * 0.35, 1),
-                    "Strength": round(time * 0.35, 1),
-                    "Flexibility": round(time * 0.2, 1),
-                    "HIIT": round(time * 0.1, 1),
-                }
-                tip = "A balanced routine with rest days ensures sustainable progress."
-
-            # Create bar chart
-            fig, ax = plt.subplots(figsize=(6, 4), facecolor='none')
-            ax.bar(suggestion.keys(), suggestion.values(), color='#ff6666')
-            ax.set_title("Workout Time Distribution", color='white')
-            ax.set_xlabel("Exercise Type", color='white')
-            ax.set_ylabel("Duration (min)", color='white')
-            ax.tick_params(axis='x', colors='white')
-            ax.tick_params(axis='y', colors='white')
-            ax.spines['bottom'].set_color('white')
-            ax.spines['left'].set_color('white')
-            ax.spines['top'].set_visible(False)
-            ax.spines['right'].set_visible(False)
-            plt.tight_layout()
-            buf = io.BytesIO()
-            plt.savefig(buf, format='png', bbox_inches='tight', transparent=True)
-            buf.seek(0)
-            chart_base64 = base64.b64encode(buf.read()).decode('utf-8')
-            buf.close()
+            suggestion, tip = exercise_plan(goal, time)
+
+            # Bar chart, served from /charts/
+            chart = chart_url("workout_bars", suggestion, chart_format())
 
         except Exception as e:
             error = "Something went wrong. Please check your input values."
@@ -483,16 +617,15 @@ def suggest_exercise():
         if tip:
             result_html += f"<p style='margin-top:10px; font-style: italic; color: #ffd699;'>{tip}</p>"
 
-        if chart_base64:
-            result_html += f'<img src="data:image/png;base64,{chart_base64}" alt="Workout Chart" style="margin-top: 15px;" />'
+        if chart:
+            result_html += chart_html(chart, "Workout Chart", "margin-top: 15px;")
 
         result_html += "</div>"
 
     if error:
         form_html += f"<div class='error' style='color: #ff9999; margin-top: 20px;'>{error}</div>"
 
-    return render_template_string(
-        HTML_TEMPLATE,
+    return render_page(
         page_title="Exercise Suggestion | Health & Fitness AI",
         heading="Exercise Duration & Type Recommendation",
         content=form_html + result_html
@@ -538,8 +671,7 @@ def more_section():
     </div>
     """
 
-    return render_template_string(
-        HTML_TEMPLATE,
+    return render_page(
         page_title="More | Health & Fitness AI",
         heading="Explore More Tools & Tips",
         content=html
@@ -549,28 +681,7 @@ def more_section():
 # In[ ]:
 
 
-@app.route("/planner", methods=["GET", "POST"])
-def health_planner():
-    plan = None
-
-    if request.method == "POST":
-        wake = request.form.get("wake_time")
-        breakfast = request.form.get("breakfast_time")
-        lunch = request.form.get("lunch_time")
-        dinner = request.form.get("dinner_time")
-        workout = request.form.get("workout_time")
-        relax = request.form.get("relax_time")
-
-        plan = {
-            "Wake-up Time": wake,
-            "Breakfast": breakfast,
-            "Lunch": lunch,
-            "Dinner": dinner,
-            "Workout": workout,
-            "Self-Care/Relaxation": relax
-        }
-
-    form_html = """
+PLANNER_FORM_HTML = """
     <form method="POST">
         <label>Wake-up Time:</label>
         <input type="time" name="wake_time" required>
@@ -594,6 +705,30 @@ def health_planner():
     </form>
     """
 
+
+@app.route("/planner", methods=["GET", "POST"])
+def health_planner():
+    plan = None
+
+    if request.method == "POST":
+        wake = request.form.get("wake_time")
+        breakfast = request.form.get("breakfast_time")
+        lunch = request.form.get("lunch_time")
+        dinner = request.form.get("dinner_time")
+        workout = request.form.get("workout_time")
+        relax = request.form.get("relax_time")
+
+        plan = {
+            "Wake-up Time": wake,
+            "Breakfast": breakfast,
+            "Lunch": lunch,
+            "Dinner": dinner,
+            "Workout": workout,
+            "Self-Care/Relaxation": relax
+        }
+
+    form_html = PLANNER_FORM_HTML
+
     result_html = ""
     if plan:
         result_html += "<div class='result'><h2>Your Personalized Health Plan for Today:</h2><ul>"
@@ -601,8 +736,7 @@ def health_planner():
             result_html += f"<li><strong>{key}:</strong> {value}</li>"
         result_html += "</ul></div>"
 
-    return render_template_string(
-        HTML_TEMPLATE,
+    return render_page(
         page_title="Health Planner | Health & Fitness AI",
         heading="Daily Health & Wellness Planner",
         content=form_html + result_html
@@ -612,7 +746,125 @@ def health_planner():
 # In[ ]:
 
 
+# JSON API: each endpoint takes {"inputs": [...]} (or a bare list) of objects
+# keyed like the form fields and answers with one result per input, in
+# order; invalid inputs get {"error": ...} instead of failing the batch.
+# Predictions run as one vectorized predict() per chunk of API_CHUNK_ROWS
+# inputs. With ?stream=1 or "Accept: application/x-ndjson" results are
+# streamed as NDJSON, one line per input, a chunk at a time; plain JSON
+# responses are limited to API_MAX_ROWS inputs.
+API_CHUNK_ROWS = int(os.environ.get("API_CHUNK_ROWS", 1000))
+API_MAX_ROWS = int(os.environ.get("API_MAX_ROWS", 10000))
+INVALID_INPUT = {"error": "Invalid input. Please check your values."}
+
+
+def api_inputs():
+    body = request.get_json(silent=True)
+    inputs = body.get("inputs") if isinstance(body, dict) else body
+    if not isinstance(inputs, list) or not all(isinstance(row, dict) for row in inputs):
+        return None
+    return inputs
+
+
+def wants_stream():
+    return request.args.get("stream") in ("1", "true") or "application/x-ndjson" in request.headers.get("Accept", "")
+
+
+def api_response(predict_chunk):
+    inputs = api_inputs()
+    if inputs is None:
+        return jsonify({"error": 'Expected a JSON list of inputs or {"inputs": [...]}'}), 400
+
+    chunks = (inputs[start:start + API_CHUNK_ROWS] for start in range(0, len(inputs), API_CHUNK_ROWS))
+    if wants_stream():
+        def lines():
+            for chunk in chunks:
+                yield "".join(json.dumps(result, ensure_ascii=False) + "\n" for result in predict_chunk(chunk))
+        return Response(stream_with_context(lines()), mimetype="application/x-ndjson")
+
+    if len(inputs) > API_MAX_ROWS:
+        return jsonify({"error": f"At most {API_MAX_ROWS} inputs per request; use ?stream=1 for more"}), 413
+    return jsonify({"results": [result for chunk in chunks for result in predict_chunk(chunk)]})
+
+
+def predict_rows(model, features, rows):
+    # Predictions for the rows the feature pipeline accepts, None for the rest
+    X, valid = features.encode(pd.DataFrame.from_records(rows))
+    predictions = [None] * len(rows)
+    if len(X):
+        for position, prediction in zip(np.flatnonzero(valid), model.predict(X)):
+            predictions[position] = prediction
+    return predictions
+
+
+def calories_chunk(rows):
+    results = []
+    for prediction in predict_rows(artifacts.get("model"), artifacts.get("features"), rows):
+        if prediction is None:
+            results.append(INVALID_INPUT)
+        else:
+            prediction = round(float(prediction), 2)
+            results.append({"Calories Burned": prediction, "summary": calories_summary(prediction)})
+    return results
+
+
+def quantized_macros_row(row):
+    # Calories are quantized like in the /macros form; anything that is not a
+    # number is left for the feature pipeline to reject, and numbers out of
+    # range are made missing so that it rejects them too
+    try:
+        cal = float(row["Calories (kcal)"])
+    except (KeyError, TypeError, ValueError):
+        return row
+    try:
+        return dict(row, **{"Calories (kcal)": quantize_calories(cal)})
+    except ValueError:
+        return dict(row, **{"Calories (kcal)": None})
+
+
+def macros_chunk(rows):
+    rows = [quantized_macros_row(row) for row in rows]
+    results = []
+    for output in predict_rows(artifacts.get("macros_model"), artifacts.get("macro_features"), rows):
+        if output is None:
+            results.append(INVALID_INPUT)
+        else:
+            prediction, summary = macros_result(output)
+            results.append(dict(prediction, summary=summary))
+    return results
+
+
+def exercise_plan_chunk(rows):
+    results = []
+    for row in rows:
+        try:
+            suggestion, tip = exercise_plan(row["Goal"], int(row["Time"]))
+            results.append({"plan": suggestion, "tip": tip})
+        except (KeyError, TypeError, ValueError):
+            results.append(INVALID_INPUT)
+    return results
+
+
+@app.route("/api/v1/calories", methods=["POST"])
+def api_calories():
+    return api_response(calories_chunk)
+
+
+@app.route("/api/v1/macros", methods=["POST"])
+def api_macros():
+    return api_response(macros_chunk)
+
+
+@app.route("/api/v1/exercise-plan", methods=["POST"])
+def api_exercise_plan():
+    return api_response(exercise_plan_chunk)
+
+
+# In[ ]:
+
+
 if __name__ == "__main__":
+    artifacts.warmup(background=True)
     app.run(debug=False)
 
 
@@ -4,17 +4,137 @@
 # In[1]:
 
 
-from flask import Flask, request, render_template_string, session
-import pandas as pd
+from flask import Flask, request, render_template, session, jsonify
+import os
 import random
-from recommender import recommend_meals, recommend_exercises
+import secrets
+from artifacts import LazyArtifacts
+from compression import init_compression
+from history import history_store
+from recommender import ANSWERS_PATH, build_answer_table, save_answer_table, load_answer_table
+from dataset import STORE_DIR, load_tables, tables_checksum, tables_mtime
+
+FALLBACK_MEALS_HTML = """
+                <div style='background-color: #fff3cd; color: #856404; border: 1px solid #ffeeba; padding: 15px; border-radius: 10px; margin-bottom: 15px;'>
+                    ⚠️ <strong>No suitable meals found</strong> based on your selected goal and diet type.
+                    <br>Showing 3 alternative meals instead:
+                </div>
+                {table}
+                """
+
+FALLBACK_EXERCISES_HTML = """
+                <div style='background-color: #fff3cd; color: #856404; border: 1px solid #ffeeba; padding: 15px; border-radius: 10px; margin-bottom: 15px;'>
+                    ⚠️ <strong>No matching exercises found</strong> for your current fitness level and BMI.
+                    <br>Showing 3 alternative exercises instead:
+                </div>
+                {table}
+                """
+
+
+def render_table(table):
+    return table.to_html(index=False, classes='data', border=0)
+
+
+def load_data():
+    # Serve from the precomputed answer table (see recommender.py). It is
+    # rebuilt from the columnar data store only when missing or when their checksum
+    # no longer matches; every answer is rendered to HTML once here.
+    mtime = tables_mtime(STORE_DIR)
+    checksum = tables_checksum(STORE_DIR) if mtime is not None else None
+    answers = load_answer_table(ANSWERS_PATH, checksum)
+    if answers is None:
+        answers = build_answer_table(load_tables(directory=STORE_DIR), checksum)
+        save_answer_table(answers, ANSWERS_PATH)
+
+    fallback_html = {}
+    for goal, tables in answers["fallbacks"].items():
+        fallback_html[goal] = {
+            "meals": FALLBACK_MEALS_HTML.format(table=render_table(tables["meals"])),
+            "exercises": FALLBACK_EXERCISES_HTML.format(table=render_table(tables["exercises"])),
+        }
+    return {
+        "mtime": mtime,
+        "meals": {key: render_table(table) for key, table in answers["meals"].items() if not table.empty},
+        "exercises": {key: render_table(table) for key, table in answers["exercises"].items() if not table.empty},
+        "fallback_html": fallback_html,
+    }
+
+
+# Recommendations are loaded on the first request that needs them
+artifacts = LazyArtifacts({"recommendations": load_data})
+
+
+def data_stale(data):
+    return tables_mtime(STORE_DIR) != data["mtime"]
+
+
+def get_data():
+    data = artifacts.get("recommendations")
+    if data_stale(data):
+        data = artifacts.reload("recommendations", stale=data_stale)
+    return data
+
+
+def recommendation(current, meals_key, exercises_key):
+    # Rendered meals, exercises and their summaries for the answer-table keys
+    # (goal, diet type, meal type) and (goal, fitness level, BMI category)
+    goal, diet_type, meal_type = meals_key
+    _, fitness_level, bmi_category = exercises_key
+    fallback_html = current["fallback_html"].get(goal, {})
+    meal_summary = ""
+    exercise_summary = ""
+
+    if meals_key in current["meals"]:
+        meals_html = current["meals"][meals_key]
+        meal_summary = (
+            f"You are aiming for <strong>{goal.lower()}</strong> with a "
+            f"<strong>{diet_type}</strong> diet during <strong>{meal_type}</strong>. "
+            f"We’ve picked meals that support your goal by optimizing for macronutrient balance."
+        )
+    else:
+        meals_html = fallback_html.get("meals", FALLBACK_MEALS_HTML.format(table=""))
+
+    if exercises_key in current["exercises"]:
+        exercises_html = current["exercises"][exercises_key]
+        exercise_summary = (
+            f"As a <strong>{fitness_level}</strong> with a <strong>{bmi_category}</strong> BMI aiming for "
+            f"<strong>{goal.lower()}</strong>, here are tailored exercises based on your intensity level and "
+            f"calorie burn potential."
+        )
+    else:
+        exercises_html = fallback_html.get("exercises", FALLBACK_EXERCISES_HTML.format(table=""))
+
+    return meals_html, exercises_html, meal_summary, exercise_summary
 
-# Load dataset
-df = pd.read_csv("merged_dataset.csv")
 
 # Flask setup
 app = Flask(__name__)
 app.secret_key = 'your_secret_key'
+init_compression(app)
+
+# Past recommendations are kept server-side as answer-table keys (see
+# history.py); the session cookie only carries the history token
+history = history_store()
+
+
+def history_token():
+    if "history" not in session:
+        session["history"] = secrets.token_urlsafe(16)
+    return session["history"]
+
+# Set WARMUP=1 to load the recommendations in a background thread at startup
+if os.environ.get("WARMUP") == "1":
+    artifacts.warmup(background=True)
+
+
+@app.route("/ready")
+def ready():
+    # Probes must not depend on traffic to load the artifacts, so a probe
+    # that finds them pending starts the background warmup (once at a time)
+    status = artifacts.status()
+    if not status["ready"]:
+        artifacts.warmup(background=True)
+    return jsonify(status), 200 if status["ready"] else 503
 
 
 # In[2]:
@@ -248,6 +368,9 @@ HTML_TEMPLATE = """
 </html>
 """
 
+# Compiled once; render_template() still applies Flask's context processors
+PAGE_TEMPLATE = app.jinja_env.from_string(HTML_TEMPLATE)
+
 
 # In[3]:
 
@@ -281,75 +404,27 @@ def home():
             show_buttons = False
 
         elif action == "show_history":
-            meals_html = session.get("prev_meals", "")
-            exercises_html = session.get("prev_exercises", "")
-            meal_summary = session.get("prev_meal_summary", "")
-            exercise_summary = session.get("prev_exercise_summary", "")
+            # The recommendation before the latest one
+            entries = history.recent(session["history"]) if "history" in session else []
+            if len(entries) > 1:
+                meals_html, exercises_html, meal_summary, exercise_summary = recommendation(
+                    get_data(), tuple(entries[1]["meals"]), tuple(entries[1]["exercises"])
+                )
             hide_form = True
             show_buttons = True
 
         else:
-            goal = request.form["goal"]
-            diet_type = request.form["diet_type"]
-            meal_type = request.form["meal_type"]
-            fitness_level = request.form["fitness_level"]
-            bmi_category = request.form["bmi_category"]
-
-            meals_df = recommend_meals(df, goal, diet_type, meal_type)
-            exercises_df = recommend_exercises(df, goal, fitness_level, bmi_category)
-
-            if not meals_df.empty:
-                meals_html = meals_df.to_html(index=False, classes='data', border=0)
-                meal_summary = (
-                    f"You are aiming for <strong>{goal.lower()}</strong> with a "
-                    f"<strong>{diet_type}</strong> diet during <strong>{meal_type}</strong>. "
-                    f"We’ve picked meals that support your goal by optimizing for macronutrient balance."
-                )
-            else:
-                fallback_meals = df[df['Goal'] == goal].sort_values(by=['Protein (g)', 'Carbohydrates (g)'], ascending=[False, True]).drop_duplicates('Food_Item').head(3)
-                fallback_meals = fallback_meals[['Food_Item', 'Category', 'Calories (kcal)', 'Protein (g)', 'Carbohydrates (g)', 'Fat (g)']]
-                meals_html = f"""
-                <div style='background-color: #fff3cd; color: #856404; border: 1px solid #ffeeba; padding: 15px; border-radius: 10px; margin-bottom: 15px;'>
-                    ⚠️ <strong>No suitable meals found</strong> based on your selected goal and diet type.
-                    <br>Showing 3 alternative meals instead:
-                </div>
-                {fallback_meals.to_html(index=False, classes='data', border=0)}
-                """
-
-            if not exercises_df.empty:
-                exercises_html = exercises_df.to_html(index=False, classes='data', border=0)
-                exercise_summary = (
-                    f"As a <strong>{fitness_level}</strong> with a <strong>{bmi_category}</strong> BMI aiming for "
-                    f"<strong>{goal.lower()}</strong>, here are tailored exercises based on your intensity level and "
-                    f"calorie burn potential."
-                )
-            else:
-                fallback_exercises = df[df['Goal'] == goal].sort_values(by='Calories Burned', ascending=False).drop_duplicates('Exercise').head(3)
-                fallback_exercises = fallback_exercises[['Exercise', 'Calories Burned', 'Duration', 'Exercise Intensity', 'Heart Rate']]
-                exercises_html = f"""
-                <div style='background-color: #fff3cd; color: #856404; border: 1px solid #ffeeba; padding: 15px; border-radius: 10px; margin-bottom: 15px;'>
-                    ⚠️ <strong>No matching exercises found</strong> for your current fitness level and BMI.
-                    <br>Showing 3 alternative exercises instead:
-                </div>
-                {fallback_exercises.to_html(index=False, classes='data', border=0)}
-                """
-
-            # Backup current session values as previous
-            session["prev_meals"] = session.get("meals", "")
-            session["prev_exercises"] = session.get("exercises", "")
-            session["prev_meal_summary"] = session.get("meal_summary", "")
-            session["prev_exercise_summary"] = session.get("exercise_summary", "")
-            
-            # Store current output
-            session["meals"] = meals_html
-            session["exercises"] = exercises_html
-            session["meal_summary"] = meal_summary
-            session["exercise_summary"] = exercise_summary
+            meals_key = (request.form["goal"], request.form["diet_type"], request.form["meal_type"])
+            exercises_key = (request.form["goal"], request.form["fitness_level"], request.form["bmi_category"])
+            meals_html, exercises_html, meal_summary, exercise_summary = recommendation(
+                get_data(), meals_key, exercises_key
+            )
+            history.push(history_token(), {"meals": list(meals_key), "exercises": list(exercises_key)})
             hide_form = True
             show_buttons = True
 
-    return render_template_string(
-        HTML_TEMPLATE,
+    return render_template(
+        PAGE_TEMPLATE,
         meals=meals_html,
         exercises=exercises_html,
         meal_summary=meal_summary,
@@ -364,6 +439,7 @@ def home():
 
 
 if __name__ == '__main__':
+    artifacts.warmup(background=True)
     app.run(debug=False)
 
 
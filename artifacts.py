@@ -0,0 +1,60 @@
+
+import threading
+
+
+class LazyArtifacts:
+    # Named artifacts (models, encoders, answer tables) that are loaded on
+    # first use instead of at import, so a worker can serve pages that do not
+    # need them right away. Each artifact has its own lock: concurrent first
+    # requests load it once, and different artifacts load in parallel.
+    # warmup() loads everything ahead of time, optionally in a background
+    # thread; at most one background warmup runs at a time.
+
+    def __init__(self, loaders):
+        self.loaders = dict(loaders)
+        self.values = {}
+        self.errors = {}
+        self.locks = {name: threading.Lock() for name in self.loaders}
+        self.warmup_lock = threading.Lock()
+        self.warmup_thread = None
+
+    def get(self, name):
+        if name in self.values:
+            return self.values[name]
+        with self.locks[name]:
+            if name not in self.values:
+                self.values[name] = self.loaders[name]()
+            return self.values[name]
+
+    def reload(self, name, stale=None):
+        # With stale, the value is checked again under the lock, so requests
+        # that all noticed the same change reload it once
+        with self.locks[name]:
+            if stale is not None and name in self.values and not stale(self.values[name]):
+                return self.values[name]
+            self.values[name] = self.loaders[name]()
+            return self.values[name]
+
+    def warmup(self, background=False):
+        if background:
+            with self.warmup_lock:
+                if self.warmup_thread is None or not self.warmup_thread.is_alive():
+                    self.warmup_thread = threading.Thread(target=self.warmup, name="artifact-warmup", daemon=True)
+                    self.warmup_thread.start()
+                return self.warmup_thread
+
+        for name in self.loaders:
+            try:
+                self.get(name)
+                self.errors.pop(name, None)
+            except Exception as e:
+                self.errors[name] = repr(e)
+
+    def status(self):
+        pending = [name for name in self.loaders if name not in self.values]
+        return {
+            "ready": not pending,
+            "loaded": [name for name in self.loaders if name in self.values],
+            "pending": pending,
+            "errors": dict(self.errors),
+        }
@@ -0,0 +1,78 @@
+
+import threading
+import time
+from concurrent.futures import Future
+from queue import Empty, Queue
+
+import numpy as np
+
+# Defaults for the prediction batchers, overridable per process with
+# PREDICT_BATCH_SIZE / PREDICT_BATCH_WAIT_MS
+BATCH_SIZE = 32
+BATCH_WAIT_MS = 2.0
+
+
+class MicroBatcher:
+    # Collects single-row predictions from concurrent requests and runs them
+    # as one predict() over the stacked rows. A batch is sent when it is full
+    # or when its first row has waited wait_ms. Every row is predicted
+    # independently, so the results are the same as calling predict() per row.
+    # With batch_size=1 rows are predicted directly in the calling thread.
+
+    def __init__(self, predict, batch_size=BATCH_SIZE, wait_ms=BATCH_WAIT_MS):
+        self.predict_rows = predict
+        self.batch_size = batch_size
+        self.wait_s = wait_ms / 1000
+        self.queue = Queue()
+        self.worker = None
+        self.lock = threading.Lock()
+        self.batches = 0
+        self.rows = 0
+
+    def predict(self, row):
+        if self.batch_size <= 1:
+            return self.predict_rows(np.asarray([row], dtype=np.float64))[0]
+
+        if self.worker is None:
+            self._start()
+        future = Future()
+        self.queue.put((row, future))
+        return future.result()
+
+    def _start(self):
+        with self.lock:
+            if self.worker is None:
+                self.worker = threading.Thread(target=self._run, name="prediction-batcher", daemon=True)
+                self.worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.perf_counter() + self.wait_s
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.perf_counter()
+                try:
+                    batch.append(self.queue.get(timeout=timeout) if timeout > 0 else self.queue.get_nowait())
+                except Empty:
+                    break
+
+            rows, futures = zip(*batch)
+            try:
+                predictions = self.predict_rows(np.asarray(rows, dtype=np.float64))
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.rows += len(batch)
+            for future, prediction in zip(futures, predictions):
+                future.set_result(prediction)
+
+    def stats(self):
+        return {
+            "batch_size": self.batch_size,
+            "wait_ms": self.wait_s * 1000,
+            "batches": self.batches,
+            "rows": self.rows,
+        }
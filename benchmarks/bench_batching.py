@@ -0,0 +1,87 @@
+"""Throughput of single-row vs micro-batched RandomForest predictions.
+
+Concurrent threads each predict their share of a set of form-like rows,
+either with one model.predict() per row or through batching.MicroBatcher.
+Batched results are checked to be identical to the per-row ones. Run from
+the repository root with the trained models in prediction_utils/:
+
+    python benchmarks/bench_batching.py
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import joblib
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from batching import MicroBatcher  # noqa: E402
+from features import load_feature_pipeline  # noqa: E402
+
+MODELS = {
+    'calories': 'calories_burned_model',
+    'macros': 'macros_model',
+}
+GRID = [round(i / 20, 2) for i in range(1, 21)]
+
+
+def form_rows(features, n, seed=0):
+    # Random encoded rows with the values the forms can submit; categorical
+    # columns take the codes of the categories the model was trained on
+    rng = np.random.default_rng(seed)
+    columns = []
+    for col in features.feature_cols:
+        if col in features.categories:
+            columns.append(rng.integers(0, len(features.categories[col]), n))
+        elif col == 'Exercise Intensity':
+            columns.append(rng.integers(1, 11, n))
+        elif col == 'Calories (kcal)':
+            columns.append(rng.random(n).round(2))
+        else:
+            columns.append(rng.choice(GRID, n))
+    return np.column_stack(columns).astype(np.float64).tolist()
+
+
+def run(predict_one, rows, threads):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        results = list(pool.map(predict_one, rows))
+    return time.perf_counter() - start, np.array(results)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[8, 32, 64])
+    parser.add_argument('--wait-ms', type=float, default=2.0)
+    parser.add_argument('--output', help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = {}
+    for name, model_name in MODELS.items():
+        model = joblib.load(f"prediction_utils/{model_name}.pkl")
+        rows = form_rows(load_feature_pipeline(model_name), args.rows)
+
+        elapsed, expected = run(lambda row: model.predict([row])[0], rows, args.threads)
+        results[name] = {'unbatched': {'rows_per_s': len(rows) / elapsed}}
+        print(f"{name:<9} unbatched          {len(rows) / elapsed:9.1f} rows/s")
+
+        for batch_size in args.batch_sizes:
+            batcher = MicroBatcher(model.predict, batch_size, args.wait_ms)
+            elapsed, batched = run(batcher.predict, rows, args.threads)
+            if not np.array_equal(batched, expected):
+                raise AssertionError(f"{name}: batched predictions differ (batch size {batch_size})")
+            stats = batcher.stats()
+            results[name][f"batch_{batch_size}"] = dict(
+                stats, rows_per_s=len(rows) / elapsed, mean_batch=stats['rows'] / stats['batches']
+            )
+            print(f"{name:<9} batch size {batch_size:<4}    {len(rows) / elapsed:9.1f} rows/s  "
+                  f"mean batch {stats['rows'] / stats['batches']:5.1f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,87 @@
+"""Chart rendering throughput and memory-leak check for charts.ChartService.
+
+Renders thousands of distinct donut and bar charts through the service with
+caching disabled, and fails if resident memory keeps growing after the
+first batch (pyplot figures that are never closed grew it without bound).
+Then measures cached lookups. PNG (matplotlib) is the default; compare with
+the SVG renderer using --format svg. Run from anywhere:
+
+    python benchmarks/bench_charts.py --renders 2000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from charts import CHART_FORMATS, ChartService  # noqa: E402
+
+
+def rss_mb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def chart_values(i):
+    # Distinct values for every i, so nothing is served from cache
+    if i % 2:
+        return 'workout_bars', {'Cardio': 10 + i * 0.1, 'HIIT': 5 + i % 50, 'Strength': 3.0}
+    return 'macros_donut', {'Protein (g)': 0.1 + i * 0.01, 'Carbohydrates (g)': 0.29, 'Fat (g)': 0.42}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--renders', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--format', choices=CHART_FORMATS, default='png')
+    parser.add_argument('--max-growth-mb', type=float, default=50.0)
+    parser.add_argument('--output', help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    service = ChartService(args.workers, cache_size=0)
+    warmup = max(args.renders // 10, 10)
+    for future in [service.submit(*chart_values(i), args.format) for i in range(warmup)]:
+        future.result()
+    baseline_mb = rss_mb()
+
+    start = time.perf_counter()
+    samples = []
+    for first in range(warmup, warmup + args.renders, 200):
+        futures = [service.submit(*chart_values(i), args.format) for i in range(first, min(first + 200, warmup + args.renders))]
+        for future in futures:
+            future.result()
+        samples.append(rss_mb())
+    elapsed = time.perf_counter() - start
+
+    cached = ChartService(args.workers)
+    kind, values = chart_values(0)
+    cached.render(kind, values, args.format)
+    lookups = 1000
+    start = time.perf_counter()
+    for _ in range(lookups):
+        cached.render(kind, values, args.format)
+    cached_ms = (time.perf_counter() - start) / lookups * 1000
+
+    results = {
+        'format': args.format,
+        'renders': args.renders,
+        'renders_per_s': args.renders / elapsed,
+        'cached_lookup_ms': cached_ms,
+        'baseline_rss_mb': baseline_mb,
+        'final_rss_mb': samples[-1],
+        'growth_mb': samples[-1] - baseline_mb,
+        'rss_samples_mb': samples,
+    }
+    print(f"{args.renders} {args.format} renders: {results['renders_per_s']:.1f}/s, cached lookup {cached_ms:.4f} ms, "
+          f"RSS {baseline_mb:.1f} -> {samples[-1]:.1f} MB")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if results['growth_mb'] > args.max_growth_mb:
+        sys.exit(f"RSS grew by {results['growth_mb']:.1f} MB over {args.renders} renders (limit {args.max_growth_mb} MB)")
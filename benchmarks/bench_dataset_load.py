@@ -0,0 +1,112 @@
+"""Startup time and memory of the dataset loaders.
+
+Each loader runs in a fresh interpreter, the way a worker process starts:
+import, load every table, then scan every column once. The baseline,
+merged_csv, is the single read_csv of merged_dataset.csv that the apps used
+to do. Nothing writes that file any more, so it is rebuilt from the raw
+CSVs into a temporary directory the way preprocessing.ipynb used to build
+it. Run from the repository root after pipeline.py has written data/:
+
+    python benchmarks/bench_dataset_load.py
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from pipeline import (  # noqa: E402
+    EXERCISE_PATH, FOOD_LOG_PATH, add_derived_columns, read_exercise_chunks, synthetic_streams,
+)
+
+# MinMax-scaled in the old merged dataset
+MERGED_SCALED_COLUMNS = [
+    'Calories (kcal)', 'Protein (g)', 'Carbohydrates (g)', 'Fat (g)',
+    'Fiber (g)', 'Sugars (g)', 'Sodium (mg)', 'Cholesterol (mg)',
+    'Water_Intake (ml)', 'Calories Burned', 'Dream Weight', 'Actual Weight',
+    'Duration', 'Heart Rate', 'BMI'
+]
+
+LOADERS = {
+    'merged_csv': 'import pandas as pd; tables = {{"merged": pd.read_csv({merged_path!r})}}',
+    'csv_tables': 'from dataset import load_csv_tables; tables = load_csv_tables()',
+    'store_mmap': 'from dataset import load_tables; tables = load_tables()',
+}
+
+WORKER = """
+import json, sys, time
+import numpy, pandas
+start = time.perf_counter()
+{loader}
+loaded = time.perf_counter()
+for table in tables.values():
+    for column in table.columns:
+        if table[column].dtype.kind in 'fiu':
+            table[column].sum()
+scanned = time.perf_counter()
+
+rss = {{}}
+with open('/proc/self/status') as f:
+    for line in f:
+        key, _, value = line.partition(':')
+        if key in ('VmRSS', 'RssAnon', 'RssFile'):
+            rss[key] = int(value.split()[0]) / 1024
+print(json.dumps({{'load_s': loaded - start, 'scan_s': scanned - loaded, 'rss_mb': rss}}))
+"""
+
+
+def write_merged_csv(directory, food_path=FOOD_LOG_PATH, exercise_path=EXERCISE_PATH):
+    # Food log left-joined with the exercise rows on User_ID, then scaled,
+    # like preprocessing.ipynb did before the tables were normalized
+    food_df = pd.read_csv(food_path)
+    exercise_df = add_derived_columns(pd.concat(read_exercise_chunks(exercise_path)), synthetic_streams())
+    merged_df = pd.merge(food_df, exercise_df, on='User_ID', how='left')
+    for col in MERGED_SCALED_COLUMNS:
+        lo, hi = merged_df[col].min(), merged_df[col].max()
+        merged_df[col] = (merged_df[col] - lo) / (hi - lo)
+    path = os.path.join(directory, 'merged_dataset.csv')
+    merged_df.to_csv(path, index=False)
+    return path, len(merged_df)
+
+
+def run_loader(name, repeat, merged_path=None):
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = subprocess.run(
+            [sys.executable, '-c', WORKER.format(loader=LOADERS[name].format(merged_path=merged_path))],
+            cwd=os.getcwd(), env=dict(os.environ, PYTHONPATH=ROOT), capture_output=True, text=True, check=True
+        )
+        result = json.loads(out.stdout)
+        result['process_s'] = time.perf_counter() - start
+        runs.append(result)
+    return min(runs, key=lambda r: r['process_s'])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        merged_path, merged_rows = write_merged_csv(tmp)
+        print(f"Rebuilt merged_dataset.csv baseline: {merged_rows} rows, "
+              f"{os.path.getsize(merged_path) / 2 ** 20:.1f} MB")
+        for name in LOADERS:
+            results[name] = run_loader(name, args.repeat, merged_path)
+    for name, r in results.items():
+        print(f"{name:<11} process {r['process_s'] * 1000:7.1f} ms  load {r['load_s'] * 1000:7.1f} ms  "
+              f"scan {r['scan_s'] * 1000:6.1f} ms  RSS {r['rss_mb'].get('VmRSS', 0):6.1f} MB "
+              f"(anon {r['rss_mb'].get('RssAnon', 0):6.1f}, file-backed {r['rss_mb'].get('RssFile', 0):6.1f})")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,67 @@
+"""Latency of flat_forest.FlatForest vs sklearn's RandomForest predict().
+
+Both models are evaluated on the same form-like rows, one row at a time and
+in small batches, and the flat predictions are checked against
+model.predict() (max absolute difference must stay below --tolerance). Run
+from the repository root with the trained models in prediction_utils/:
+
+    python benchmarks/bench_flat_forest.py
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import warnings
+
+import joblib
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from flat_forest import FlatForest  # noqa: E402
+from bench_batching import MODELS, form_rows  # noqa: E402
+from features import load_feature_pipeline  # noqa: E402
+
+
+def latency_ms(predict, rows, batch_size, repeat):
+    batches = [rows[i:i + batch_size] for i in range(0, min(len(rows), batch_size * repeat), batch_size)]
+    start = time.perf_counter()
+    for batch in batches:
+        predict(batch)
+    return (time.perf_counter() - start) / len(batches) * 1000
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 64])
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--tolerance', type=float, default=1e-9)
+    parser.add_argument('--output', help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    # The forests were fitted on DataFrames; plain rows are fine here
+    warnings.filterwarnings('ignore', message='X does not have valid feature names')
+
+    results = {}
+    for name, model_name in MODELS.items():
+        model = joblib.load(f"prediction_utils/{model_name}.pkl")
+        forest = FlatForest.from_model(model)
+        rows = np.array(form_rows(load_feature_pipeline(model_name), args.rows))
+
+        max_error = float(np.abs(forest.predict(rows) - model.predict(rows)).max())
+        if max_error > args.tolerance:
+            raise AssertionError(f"{name}: flat forest differs from model.predict() by {max_error}")
+        results[name] = {'max_abs_error': max_error}
+        print(f"{name:<9} max abs error {max_error:.2e}")
+
+        for batch_size in args.batch_sizes:
+            sklearn_ms = latency_ms(model.predict, rows, batch_size, args.repeat)
+            flat_ms = latency_ms(forest.predict, rows, batch_size, args.repeat)
+            results[name][f"batch_{batch_size}"] = {'sklearn_ms': sklearn_ms, 'flat_ms': flat_ms}
+            print(f"{name:<9} batch {batch_size:<4} sklearn {sklearn_ms:8.3f} ms  flat {flat_ms:8.3f} ms  "
+                  f"({sklearn_ms / flat_ms:5.1f}x)")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
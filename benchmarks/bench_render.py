@@ -0,0 +1,112 @@
+"""Per-route page render time for the Predictor and Recommendation apps.
+
+Each route is requested through the Flask test client (GET and a valid
+POST), and the page template alone is timed both ways: compiled on every
+call with render_template_string (as the routes used to do) and rendered
+from the template compiled once at import. Run from the repository root
+with the trained models in prediction_utils/ and the data store in data/:
+
+    python benchmarks/bench_render.py --requests 200
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+from flask import render_template_string
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import Predictor  # noqa: E402
+import Recommendation_app  # noqa: E402
+
+PREDICTOR_REQUESTS = {
+    'calories': ('/', {
+        'Exercise Intensity': '5', 'Duration': '0.3', 'Heart Rate': '0.4',
+        'BMI_Category': 'Normal', 'Fitness_Level': 'Beginner',
+    }),
+    'macros': ('/macros', {
+        'Calories (kcal)': '0.3', 'Meal_Type': 'Lunch', 'Diet_Type': 'Vegan', 'BMI_Category': 'Normal',
+    }),
+    'exercise': ('/exercise', {
+        'BMI_Category': 'Normal', 'Fitness_Level': 'Beginner', 'Workout_Preference': 'HIIT',
+        'Time': '30', 'Goal': 'Muscle Gain', 'Gender': 'Male',
+    }),
+    'more': ('/more', None),
+    'planner': ('/planner', {
+        'wake_time': '07:00', 'breakfast_time': '08:00', 'lunch_time': '13:00', 'dinner_time': '20:00',
+    }),
+}
+RECOMMENDATION_FORM = {
+    'goal': 'Loss', 'diet_type': 'Balanced', 'meal_type': 'Lunch',
+    'fitness_level': 'Beginner', 'bmi_category': 'Normal',
+}
+
+
+def time_ms(call, n):
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        call()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {'mean_ms': statistics.fmean(samples), 'p50_ms': statistics.median(samples)}
+
+
+def request_timings(client, path, form, n):
+    def get():
+        assert client.get(path).status_code == 200
+
+    def post():
+        assert client.post(path, data=form).status_code == 200
+
+    get()
+    timings = {'GET': time_ms(get, n)}
+    if form is not None:
+        post()
+        timings['POST'] = time_ms(post, n)
+    return timings
+
+
+def template_timings(app, template, compiled, context, n):
+    with app.test_request_context():
+        return {
+            'compile_per_call': time_ms(lambda: render_template_string(template, **context), n),
+            'compiled_once': time_ms(lambda: compiled.render(**context), n),
+        }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--output', help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    Predictor.artifacts.warmup()
+    Recommendation_app.artifacts.warmup()
+
+    results = {'routes': {}}
+    client = Predictor.app.test_client()
+    for route, (path, form) in PREDICTOR_REQUESTS.items():
+        results['routes'][route] = request_timings(client, path, form, args.requests)
+    results['routes']['recommendations'] = request_timings(
+        Recommendation_app.app.test_client(), '/', RECOMMENDATION_FORM, args.requests)
+
+    predictor_context = {'page_title': 'Calories Burned', 'heading': 'Calories Burned Prediction',
+                         'content': Predictor.CALORIES_FORM_HTML}
+    results['templates'] = {
+        'predictor': template_timings(Predictor.app, Predictor.HTML_TEMPLATE, Predictor.PAGE_TEMPLATE,
+                                      predictor_context, args.requests),
+        'recommendations': template_timings(Recommendation_app.app, Recommendation_app.HTML_TEMPLATE,
+                                            Recommendation_app.PAGE_TEMPLATE, {'tip_of_the_day': 'tip'}, args.requests),
+    }
+
+    for route, timings in results['routes'].items():
+        print(f"{route:<16} " + "  ".join(f"{method} {t['p50_ms']:7.3f} ms" for method, t in timings.items()))
+    for app_name, timings in results['templates'].items():
+        print(f"{app_name} template: compiled per call {timings['compile_per_call']['p50_ms']:.3f} ms, "
+              f"compiled once {timings['compiled_once']['p50_ms']:.3f} ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,350 @@
+"""Latency and throughput of every route, plus recommender/model micro-benchmarks.
+
+Nothing leaves the machine. Each route of Predictor.py and
+Recommendation_app.py is driven two ways: sequentially through the Flask
+test client, and by a pool of threads sending keep-alive requests to the
+app served on a loopback port by werkzeug's threaded server. For each route
+the p50/p95/p99 latency and requests/s are reported. The micro-benchmarks
+time recommend_meals and recommend_exercises (indexed and scanning) and
+model.predict of both models, for one row and for a batch. Before timing,
+the scanning recommenders are checked against the plain pandas
+filter -> drop_duplicates -> head path on categorical, object-dtype and
+NaN-bearing copies of the data. Run from the
+repository root with the trained models in prediction_utils/ and the data
+store in data/store/, and keep the JSON to compare later commits against:
+
+    python benchmarks/bench_routes.py --output bench_routes.json
+    python benchmarks/bench_routes.py --compare bench_routes.json
+"""
+import argparse
+import http.client
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle, islice
+from urllib.parse import urlencode
+
+import numpy as np
+import pandas as pd
+from werkzeug.serving import make_server
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import Predictor  # noqa: E402
+import Recommendation_app  # noqa: E402
+from calorie_grid import CALORIE_FORM_OPTIONS  # noqa: E402
+from dataset import STORE_DIR, exercise_frame, load_tables, meal_frame  # noqa: E402
+from recommender import (  # noqa: E402
+    BMI_CATEGORIES, DIET_TYPES, EXERCISE_COLUMNS, FITNESS_LEVELS, GOALS, MEAL_COLUMNS, MEAL_TYPES,
+    build_exercise_index, build_meal_index, recommend_exercises, recommend_meals,
+)
+
+FORM_VARIANTS = 64
+PERCENTILES = [50, 95, 99]
+MACROS_OPTIONS = {
+    'Meal_Type': ['Breakfast', 'Lunch', 'Dinner', 'Snack'],
+    'Diet_Type': ['Balanced', 'Low-Carb', 'High-Protein', 'Vegan'],
+    'BMI_Category': ['Normal', 'Overweight', 'Obese'],
+}
+
+
+def summarize(samples_s, elapsed_s=None):
+    # Latency percentiles in ms; throughput over the wall time when given,
+    # else one call after another
+    ms = np.array(samples_s) * 1000
+    summary = {f'p{p}_ms': float(np.percentile(ms, p)) for p in PERCENTILES}
+    summary['mean_ms'] = float(ms.mean())
+    summary['per_s'] = len(ms) / (elapsed_s if elapsed_s is not None else ms.sum() / 1000)
+    return summary
+
+
+def choices(rng, options):
+    return {name: str(rng.choice(values)) for name, values in options.items()}
+
+
+def route_requests(seed=0):
+    # (app, method, path, bodies) per route; form bodies vary so the caches
+    # see a realistic mix of hits and misses
+    rng = np.random.default_rng(seed)
+    calories = [choices(rng, dict(CALORIE_FORM_OPTIONS, BMI_Category=['Normal', 'Overweight', 'Obese']))
+                for _ in range(FORM_VARIANTS)]
+    macros = [dict(choices(rng, MACROS_OPTIONS), **{'Calories (kcal)': f"{rng.random():.2f}"})
+              for _ in range(FORM_VARIANTS)]
+    exercise = [choices(rng, {name: values for name, values in Predictor.EXERCISE_FORM_OPTIONS.items()})
+                for _ in range(FORM_VARIANTS)]
+    planner = [{'wake_time': '07:00', 'breakfast_time': '08:00', 'lunch_time': '13:00', 'dinner_time': '20:00'}]
+    recommendation = [choices(rng, {
+        'goal': GOALS, 'diet_type': DIET_TYPES, 'meal_type': MEAL_TYPES,
+        'fitness_level': FITNESS_LEVELS, 'bmi_category': BMI_CATEGORIES,
+    }) for _ in range(FORM_VARIANTS)]
+    chart = '/charts/workout_bars.svg?' + urlencode({'Cardio': 10.5, 'Strength': 10.5, 'Flexibility': 6.0, 'HIIT': 3.0})
+
+    predictor, recommender_app = Predictor.app, Recommendation_app.app
+    return {
+        'predictor GET /': (predictor, 'GET', '/', [None]),
+        'predictor POST /': (predictor, 'POST', '/', calories),
+        'predictor GET /macros': (predictor, 'GET', '/macros', [None]),
+        'predictor POST /macros': (predictor, 'POST', '/macros', macros),
+        'predictor GET /exercise': (predictor, 'GET', '/exercise', [None]),
+        'predictor POST /exercise': (predictor, 'POST', '/exercise', exercise),
+        'predictor GET /planner': (predictor, 'GET', '/planner', [None]),
+        'predictor POST /planner': (predictor, 'POST', '/planner', planner),
+        'predictor GET /more': (predictor, 'GET', '/more', [None]),
+        'predictor GET /charts': (predictor, 'GET', chart, [None]),
+        'predictor POST /api/v1/calories': (predictor, 'POST', '/api/v1/calories', [{'inputs': calories}]),
+        'predictor POST /api/v1/macros': (predictor, 'POST', '/api/v1/macros', [{'inputs': macros}]),
+        'predictor GET /stats': (predictor, 'GET', '/stats', [None]),
+        'predictor GET /ready': (predictor, 'GET', '/ready', [None]),
+        'recommendation GET /': (recommender_app, 'GET', '/', [None]),
+        'recommendation POST /': (recommender_app, 'POST', '/', recommendation),
+        'recommendation POST / history': (recommender_app, 'POST', '/', [{'action': 'show_history'}]),
+        'recommendation GET /ready': (recommender_app, 'GET', '/ready', [None]),
+    }
+
+
+def encode_body(path, body):
+    # (bytes, content type) as a browser or API client would send them
+    if body is None:
+        return None, None
+    if path.startswith('/api/'):
+        return json.dumps(body).encode(), 'application/json'
+    return urlencode(body).encode(), 'application/x-www-form-urlencoded'
+
+
+def bench_test_client(routes, n):
+    results = {}
+    for name, (app, method, path, bodies) in routes.items():
+        client = app.test_client()
+        samples = []
+        for body in islice(cycle(bodies), n + 1):
+            data, content_type = encode_body(path, body)
+            start = time.perf_counter()
+            response = client.open(path, method=method, data=data, content_type=content_type)
+            samples.append(time.perf_counter() - start)
+            assert response.status_code == 200, (name, response.status_code)
+        results[name] = summarize(samples[1:])
+    return results
+
+
+class LocalServer:
+    # The app on 127.0.0.1 with werkzeug's threaded server, in a daemon thread
+
+    def __init__(self, app):
+        self.server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.port = self.server.server_port
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.thread.join()
+
+
+def bench_http(routes, n, threads):
+    servers = {}
+    local = threading.local()
+
+    def send(request):
+        port, method, path, body = request
+        data, content_type = encode_body(path, body)
+        headers = {'Content-Type': content_type} if content_type else {}
+        connections = local.__dict__.setdefault('connections', {})
+        start = time.perf_counter()
+        for attempt in range(2):
+            # Keep-alive connection per thread and port; reconnect once if the
+            # server closed it
+            if port not in connections:
+                connections[port] = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+            try:
+                connections[port].request(method, path, body=data, headers=headers)
+                response = connections[port].getresponse()
+                response.read()
+                break
+            except (http.client.HTTPException, ConnectionError):
+                connections.pop(port).close()
+                if attempt:
+                    raise
+        assert response.status == 200, (path, response.status)
+        return time.perf_counter() - start
+
+    results = {}
+    try:
+        with ThreadPoolExecutor(threads) as pool:
+            for name, (app, method, path, bodies) in routes.items():
+                if id(app) not in servers:
+                    servers[id(app)] = LocalServer(app)
+                port = servers[id(app)].port
+                requests = [(port, method, path, body) for body in islice(cycle(bodies), n)]
+                list(pool.map(send, requests[:threads]))
+                start = time.perf_counter()
+                samples = list(pool.map(send, requests))
+                results[name] = summarize(samples, time.perf_counter() - start)
+    finally:
+        for server in servers.values():
+            server.close()
+    return results
+
+
+def time_calls(call, n):
+    call()
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def pandas_meals(df, goal, diet_type, meal_type, k):
+    # The filters as recommend_meals first did them, on the whole frame
+    df = df[(df['Goal'] == goal) & (df['Diet_Type'] == diet_type) & (df['Meal_Type'] == meal_type)]
+    df = df[(df['Calories (kcal)'] < 0.35) & (df['Carbohydrates (g)'] < 0.3)]
+    return df[MEAL_COLUMNS].drop_duplicates().head(k)
+
+
+def pandas_exercises(df, goal, fitness_level, bmi_category, k):
+    intensity = df['Exercise Intensity']
+    if fitness_level == 'Beginner':
+        df = df[intensity <= 4]
+    elif fitness_level == 'Intermediate':
+        df = df[(intensity > 4) & (intensity <= 7)]
+    else:
+        df = df[intensity > 7]
+    if goal == 'Loss':
+        df = df[df['Duration'] >= 40]
+    elif goal == 'Gain':
+        df = df[df['Duration'] <= 40]
+    if bmi_category == 'Obese':
+        df = df[df['Calories Burned'] >= 300]
+    elif bmi_category == 'Underweight':
+        df = df[df['Calories Burned'] <= 250]
+    return df[EXERCISE_COLUMNS].drop_duplicates().head(k)
+
+
+def frame_variants(df, text_columns, nan_columns, seed=0):
+    # The frame as loaded (categoricals), with plain object strings as
+    # pd.read_csv gives them, and with NaN in every 7th row of some columns
+    # (first duplicating each row, so rows that only match with NaN exist)
+    objects = df.astype({col: object for col in text_columns if col in df})
+    with_nan = pd.concat([objects, objects]).sort_index(kind='stable').reset_index(drop=True)
+    rows = np.random.default_rng(seed).permutation(len(with_nan) // 2)[::7] * 2
+    for col in nan_columns:
+        with_nan.loc[np.concatenate([rows, rows + 1]), col] = np.nan
+    return {'categorical': df, 'object': objects, 'nan': with_nan}
+
+
+def check_scans(meals, exercises, ks=(1, 5, 50)):
+    text_columns = ['Food_Item', 'Category', 'Exercise', 'Goal', 'Diet_Type', 'Meal_Type']
+    checks = [
+        (meals, ['Category', 'Protein (g)'], recommend_meals, pandas_meals, [GOALS, DIET_TYPES, MEAL_TYPES]),
+        (exercises, ['Exercise', 'Heart Rate'], recommend_exercises, pandas_exercises,
+         [GOALS, FITNESS_LEVELS, BMI_CATEGORIES]),
+    ]
+    for df, nan_columns, recommend, reference, options in checks:
+        for variant, frame in frame_variants(df, text_columns, nan_columns).items():
+            for key in itertools.product(*options):
+                for k in ks:
+                    expected = reference(frame, *key, k)
+                    pd.testing.assert_frame_equal(recommend(frame, *key, k=k), expected, check_dtype=False,
+                                                  obj=f"{recommend.__name__}{key} k={k} on {variant} frame")
+
+
+def bench_micro(n, batch_size, seed=0):
+    rng = np.random.default_rng(seed)
+    tables = load_tables(directory=STORE_DIR)
+    meals, exercises = meal_frame(tables), exercise_frame(tables)
+    check_scans(meals, exercises)
+    meal_index, exercise_index = build_meal_index(meals), build_exercise_index(exercises)
+    meal_keys = [tuple(rng.choice(values) for values in (GOALS, DIET_TYPES, MEAL_TYPES)) for _ in range(n)]
+    exercise_keys = [tuple(rng.choice(values) for values in (GOALS, FITNESS_LEVELS, BMI_CATEGORIES)) for _ in range(n)]
+    meal_keys, exercise_keys = cycle(meal_keys), cycle(exercise_keys)
+
+    results = {
+        'recommend_meals indexed': time_calls(lambda: recommend_meals(meals, *next(meal_keys), meal_index=meal_index), n),
+        'recommend_meals scan': time_calls(lambda: recommend_meals(meals, *next(meal_keys)), n),
+        'recommend_exercises indexed': time_calls(
+            lambda: recommend_exercises(exercises, *next(exercise_keys), exercise_index=exercise_index), n),
+        'recommend_exercises scan': time_calls(lambda: recommend_exercises(exercises, *next(exercise_keys)), n),
+    }
+
+    artifacts = Predictor.artifacts
+    forms = {
+        'calories': ('model', 'features', pd.DataFrame(
+            [choices(rng, dict(CALORIE_FORM_OPTIONS, BMI_Category=['Normal', 'Overweight', 'Obese']))
+             for _ in range(batch_size)])),
+        'macros': ('macros_model', 'macro_features', pd.DataFrame(
+            [dict(choices(rng, MACROS_OPTIONS), **{'Calories (kcal)': rng.random()}) for _ in range(batch_size)])),
+    }
+    for name, (model_name, features_name, frame) in forms.items():
+        model = artifacts.get(model_name)
+        X, valid = artifacts.get(features_name).encode(frame)
+        assert valid.all(), name
+        rows = cycle(X[i:i + 1] for i in range(len(X)))
+        results[f'{name} model.predict 1 row'] = time_calls(lambda: model.predict(next(rows)), n)
+        results[f'{name} model.predict {batch_size} rows'] = time_calls(lambda: model.predict(X), max(n // 10, 10))
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_section(title, results, baseline=None):
+    print(f"\n{title}")
+    for name, r in results.items():
+        line = (f"  {name:<36} p50 {r['p50_ms']:8.3f}  p95 {r['p95_ms']:8.3f}  p99 {r['p99_ms']:8.3f} ms"
+                f"  {r['per_s']:9.1f}/s")
+        if baseline and name in baseline:
+            line += f"  p50 {r['p50_ms'] / baseline[name]['p50_ms']:5.2f}x of baseline"
+        print(line)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200, help="requests per route through the test client")
+    parser.add_argument('--http-requests', type=int, default=400, help="requests per route over HTTP")
+    parser.add_argument('--threads', type=int, default=8, help="concurrent HTTP clients")
+    parser.add_argument('--calls', type=int, default=200, help="calls per micro-benchmark")
+    parser.add_argument('--batch-size', type=int, default=256, help="rows per batched model.predict")
+    parser.add_argument('--skip-http', action='store_true')
+    parser.add_argument('--compare', help="JSON results of an earlier run to compare p50 latencies with")
+    parser.add_argument('--output', help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    Predictor.artifacts.warmup()
+    Recommendation_app.artifacts.warmup()
+    routes = route_requests()
+
+    results = {
+        'meta': {
+            'commit': git_commit(), 'python': platform.python_version(), 'machine': platform.machine(),
+            'cpus': os.cpu_count(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'args': vars(args),
+        },
+        'test_client': bench_test_client(routes, args.requests),
+    }
+    if not args.skip_http:
+        results['http'] = bench_http(routes, args.http_requests, args.threads)
+    results['micro'] = bench_micro(args.calls, args.batch_size)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_section("Test client (sequential)", results['test_client'], baseline.get('test_client'))
+    if 'http' in results:
+        print_section(f"HTTP, {args.threads} threads", results['http'], baseline.get('http'))
+    print_section("Micro-benchmarks", results['micro'], baseline.get('micro'))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
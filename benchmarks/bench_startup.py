@@ -0,0 +1,108 @@
+"""Cold start of the Flask apps: import to first response.
+
+Each app starts in a fresh interpreter and is driven through the Flask test
+client. Three startup modes are compared:
+
+    eager       load every artifact right after import (the old behaviour)
+    lazy        load artifacts on the first request that needs them
+    background  WARMUP=1, artifacts load in a background thread
+
+For each mode the worker reports the time from the start of the import to
+the first page, to the first prediction/recommendation, and to /ready
+returning 200 (not in lazy mode, where artifacts no request has used yet
+stay unloaded). Run from the repository root with the trained models in
+prediction_utils/ and the data store in data/store/:
+
+    python benchmarks/bench_startup.py
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+APPS = {
+    'Predictor': {
+        'path': '/',
+        'form': {
+            'Exercise Intensity': '5', 'Duration': '0.5', 'Heart Rate': '0.5',
+            'BMI_Category': 'Normal', 'Fitness_Level': 'Beginner',
+        },
+    },
+    'Recommendation_app': {
+        'path': '/',
+        'form': {
+            'goal': 'Loss', 'diet_type': 'Balanced', 'meal_type': 'Lunch',
+            'fitness_level': 'Beginner', 'bmi_category': 'Normal',
+        },
+    },
+}
+MODES = ['eager', 'lazy', 'background']
+
+WORKER = """
+import json, time
+start = time.perf_counter()
+import {module} as module
+imported = time.perf_counter()
+if {eager}:
+    module.artifacts.warmup()
+client = module.app.test_client()
+
+first_page = client.get({path!r})
+assert first_page.status_code == 200
+first_page_s = time.perf_counter() - start
+
+first_answer = client.post({path!r}, data={form!r})
+assert first_answer.status_code == 200
+first_answer_s = time.perf_counter() - start
+
+ready_s = None
+if {wait_ready}:
+    while client.get('/ready').status_code != 200:
+        time.sleep(0.001)
+    ready_s = time.perf_counter() - start
+
+print(json.dumps({{
+    'import_s': imported - start, 'first_page_s': first_page_s,
+    'first_answer_s': first_answer_s, 'ready_s': ready_s,
+}}))
+"""
+
+
+def run_app(module, mode, repeat):
+    app = APPS[module]
+    code = WORKER.format(module=module, eager=mode == 'eager', wait_ready=mode != 'lazy', path=app['path'], form=app['form'])
+    env = dict(os.environ, PYTHONPATH=ROOT, WARMUP='1' if mode == 'background' else '0')
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = subprocess.run(
+            [sys.executable, '-c', code], cwd=os.getcwd(), env=env, capture_output=True, text=True, check=True
+        )
+        result = json.loads(out.stdout.splitlines()[-1])
+        result['process_s'] = time.perf_counter() - start
+        runs.append(result)
+    return min(runs, key=lambda r: r['first_page_s'])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = {}
+    for module in APPS:
+        results[module] = {}
+        for mode in MODES:
+            r = results[module][mode] = run_app(module, mode, args.repeat)
+            print(f"{module:<18} {mode:<10} import {r['import_s'] * 1000:7.1f} ms  "
+                  f"first page {r['first_page_s'] * 1000:7.1f} ms  first answer {r['first_answer_s'] * 1000:7.1f} ms"
+                  + (f"  ready {r['ready_s'] * 1000:7.1f} ms" if r['ready_s'] is not None else ""))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
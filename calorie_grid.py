@@ -0,0 +1,116 @@
+
+import argparse
+import os
+
+import joblib
+import numpy as np
+
+from features import load_feature_pipeline
+from flat_forest import model_version
+
+MODEL_DIR = "prediction_utils"
+GRID_FILE = "calorie_grid.npz"
+
+# Every value the calories form offers, in option order
+CALORIE_FORM_OPTIONS = {
+    "Exercise Intensity": list(range(1, 11)),
+    "Duration": [round(i / 20, 2) for i in range(1, 21)],
+    "Heart Rate": [round(i / 20, 2) for i in range(1, 21)],
+    "BMI_Category": ["Underweight", "Normal", "Overweight", "Obese"],
+    "Fitness_Level": ["Beginner", "Intermediate", "Advanced"],
+}
+
+
+def build_calorie_grid(model, features):
+    # Predict every combination of form options (10 x 20 x 20 x 4 x 3 =
+    # 48,000 rows) in one call; axis i of the result follows
+    # features.feature_cols[i]. Options the model never saw in training are
+    # NaN, as the live model cannot predict them either.
+    axes, unknown = [], []
+    for col in features.feature_cols:
+        values = CALORIE_FORM_OPTIONS[col]
+        if col in features.codes:
+            codes = np.array([features.codes[col].get(value, -1) for value in values])
+            axes.append(np.maximum(codes, 0).astype(np.float64))
+            unknown.append(codes < 0)
+        else:
+            axes.append(np.array(values, dtype=np.float64))
+            unknown.append(np.zeros(len(values), dtype=bool))
+
+    mesh = np.meshgrid(*axes, indexing="ij")
+    X = np.column_stack([axis.ravel() for axis in mesh]).astype(np.float64)
+    grid = model.predict(X).reshape([len(axis) for axis in axes])
+    for position, mask in enumerate(unknown):
+        index = [slice(None)] * grid.ndim
+        index[position] = mask
+        grid[tuple(index)] = np.nan
+    return grid
+
+
+class CalorieGrid:
+    # Precomputed calories model output for every form input. lookup() maps
+    # each submitted value to its option position and reads the grid, or
+    # returns None for a value the form does not offer. Like the encoders it
+    # raises ValueError for an option the model was not trained on.
+
+    def __init__(self, grid, feature_cols, model_version=None):
+        self.grid = grid
+        self.feature_cols = list(feature_cols)
+        self.model_version = model_version
+        self.positions = [
+            {value: position for position, value in enumerate(CALORIE_FORM_OPTIONS[col])}
+            for col in self.feature_cols
+        ]
+
+    def lookup(self, data):
+        index = []
+        for col, positions in zip(self.feature_cols, self.positions):
+            value = data[col]
+            if not isinstance(CALORIE_FORM_OPTIONS[col][0], str):
+                value = float(value)
+            position = positions.get(value)
+            if position is None:
+                return None
+            index.append(position)
+
+        prediction = self.grid[tuple(index)]
+        if np.isnan(prediction):
+            raise ValueError(f"no prediction for {data}")
+        return prediction
+
+    def save(self, path):
+        np.savez(
+            path, grid=self.grid, feature_cols=np.array(self.feature_cols),
+            model_version=np.array(self.model_version or ""),
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            version = str(arrays["model_version"]) if "model_version" in arrays else None
+            return cls(arrays["grid"], arrays["feature_cols"].tolist(), version)
+
+
+def load_calorie_grid(directory=MODEL_DIR):
+    # None when the grid is missing or was built from another model version
+    grid_path = os.path.join(directory, GRID_FILE)
+    if not os.path.exists(grid_path):
+        return None
+    grid = CalorieGrid.load(grid_path)
+    if grid.model_version != model_version("calories_burned_model", directory):
+        return None
+    return grid
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Precompute the calories model over every input of the calories form.")
+    parser.add_argument('--model-dir', default=MODEL_DIR)
+    args = parser.parse_args()
+
+    model = joblib.load(os.path.join(args.model_dir, "calories_burned_model.pkl"))
+    features = load_feature_pipeline("calories_burned_model", args.model_dir)
+    grid = CalorieGrid(
+        build_calorie_grid(model, features), features.feature_cols, model_version("calories_burned_model", args.model_dir)
+    )
+    grid.save(os.path.join(args.model_dir, GRID_FILE))
+    print(f"Wrote {int(np.isfinite(grid.grid).sum())} of {grid.grid.size} form inputs to {os.path.join(args.model_dir, GRID_FILE)}")
@@ -0,0 +1,225 @@
+
+import hashlib
+import html
+import io
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import LRUCache
+
+CHART_WORKERS = 2
+CHART_CACHE_SIZE = 256
+
+# SVG is drawn here without any dependency; PNG needs matplotlib, which is
+# only imported when a PNG is rendered
+CHART_FORMATS = ['svg', 'png']
+CHART_FORMAT = 'svg'
+CHART_MIMETYPES = {'svg': 'image/svg+xml', 'png': 'image/png'}
+# Part of every ETag; bump it when the drawings change so browsers refetch
+CHART_VERSION = 1
+
+DONUT_COLORS = ['#00cc99', '#00bfff', '#ff9966']
+BAR_COLOR = '#ff6666'
+SVG_FONT = "DejaVu Sans, Arial, sans-serif"
+
+
+def _png_bytes(fig):
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', bbox_inches='tight', transparent=True)
+    return buf.getvalue()
+
+
+def _svg(width, height, body):
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}" font-family="{SVG_FONT}">' + "".join(body) + '</svg>'
+    )
+
+
+def _text(x, y, text, size, anchor='middle', **attrs):
+    extra = "".join(f' {name.replace("_", "-")}="{value}"' for name, value in attrs.items())
+    return (
+        f'<text x="{x:.1f}" y="{y:.1f}" font-size="{size}" fill="white" text-anchor="{anchor}" '
+        f'dominant-baseline="central"{extra}>{html.escape(str(text))}</text>'
+    )
+
+
+def macros_donut_svg(values):
+    # Same layout as the matplotlib donut: wedges counter-clockwise from
+    # 12 o'clock, labels outside the ring, percentages on the inner edge
+    total = sum(values.values())
+    if total <= 0 or min(values.values()) < 0:
+        raise ValueError(f"cannot draw a donut of {values}")
+
+    width, height, radius = 600, 440, 150
+    cx, cy = width / 2, height / 2
+
+    def point(angle, r):
+        return cx + r * math.cos(math.radians(angle)), cy - r * math.sin(math.radians(angle))
+
+    wedges, labels = [], []
+    angle = 90.0
+    for (label, value), color in zip(values.items(), DONUT_COLORS * len(values)):
+        sweep = 360.0 * value / total
+        if sweep >= 359.99:
+            wedges.append(f'<circle cx="{cx}" cy="{cy}" r="{radius}" fill="{color}" stroke="white"/>')
+        elif sweep > 0:
+            x1, y1 = point(angle, radius)
+            x2, y2 = point(angle + sweep, radius)
+            wedges.append(
+                f'<path d="M{cx},{cy} L{x1:.2f},{y1:.2f} A{radius},{radius} 0 {int(sweep > 180)} 0 {x2:.2f},{y2:.2f} Z" '
+                f'fill="{color}" stroke="white"/>'
+            )
+
+        middle = angle + sweep / 2
+        x, y = point(middle, radius * 1.1)
+        labels.append(_text(x, y, label, 16, 'start' if math.cos(math.radians(middle)) > 0 else 'end'))
+        x, y = point(middle, radius * 0.6)
+        labels.append(_text(x, y, f"{100 * value / total:.1f}%", 16))
+        angle += sweep
+
+    centre = f'<circle cx="{cx}" cy="{cy}" r="{radius * 0.6}" fill="black"/>'
+    return _svg(width, height, wedges + [centre] + labels)
+
+
+def _ticks(top, max_ticks=6):
+    # Round tick steps (1, 2, 2.5, 5 x 10^n) up to top
+    if top <= 0:
+        return [0]
+    raw = top / max_ticks
+    magnitude = 10 ** math.floor(math.log10(raw))
+    step = next(m * magnitude for m in (1, 2, 2.5, 5, 10) if m * magnitude >= raw)
+    return [i * step for i in range(int(top / step + 1e-9) + 1)]
+
+
+def workout_bars_svg(values):
+    # Same layout as the matplotlib bar chart: title, white axis labels and
+    # ticks, left and bottom spines only, 5% headroom above the tallest bar
+    width, height = 600, 400
+    left, right, top, bottom = 70, 20, 40, 60
+    plot_width, plot_height = width - left - right, height - top - bottom
+    y_max = max(list(values.values()) + [0]) * 1.05 or 1
+    base = top + plot_height
+
+    def y(value):
+        return base - plot_height * value / y_max
+
+    body = [_text(left + plot_width / 2, top / 2, "Workout Time Distribution", 16)]
+    slot = plot_width / max(len(values), 1)
+    for position, (label, value) in enumerate(values.items()):
+        x = left + slot * position
+        body.append(
+            f'<rect x="{x + slot * 0.1:.1f}" y="{y(max(value, 0)):.1f}" width="{slot * 0.8:.1f}" '
+            f'height="{base - y(max(value, 0)):.1f}" fill="{BAR_COLOR}"/>'
+        )
+        body.append(_text(x + slot / 2, base + 14, label, 13))
+
+    for tick in _ticks(y_max):
+        body.append(f'<line x1="{left - 5}" y1="{y(tick):.1f}" x2="{left}" y2="{y(tick):.1f}" stroke="white"/>')
+        body.append(_text(left - 8, y(tick), f"{tick:g}", 13, 'end'))
+
+    body.append(f'<line x1="{left}" y1="{top}" x2="{left}" y2="{base}" stroke="white"/>')
+    body.append(f'<line x1="{left}" y1="{base}" x2="{left + plot_width}" y2="{base}" stroke="white"/>')
+    body.append(_text(left + plot_width / 2, height - 18, "Exercise Type", 14))
+    body.append(_text(18, top + plot_height / 2, "Duration (min)", 14, transform=f"rotate(-90 18 {top + plot_height / 2})"))
+    return _svg(width, height, body)
+
+
+def macros_donut_png(values):
+    # Object-oriented Agg API: the figure belongs to this call only and is
+    # freed with it, nothing is registered in pyplot's global state
+    from matplotlib.figure import Figure
+    from matplotlib.patches import Circle
+
+    fig = Figure(figsize=(6, 6), facecolor='none')
+    ax = fig.subplots()
+    ax.pie(
+        list(values.values()), labels=list(values.keys()), autopct='%1.1f%%', startangle=90,
+        colors=DONUT_COLORS, textprops={'color': 'white', 'fontsize': 12},
+        wedgeprops={'edgecolor': 'white'}
+    )
+    ax.add_artist(Circle((0, 0), 0.60, fc='black'))
+    ax.axis('equal')
+    fig.tight_layout()
+    return _png_bytes(fig)
+
+
+def workout_bars_png(values):
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(6, 4), facecolor='none')
+    ax = fig.subplots()
+    ax.bar(values.keys(), values.values(), color=BAR_COLOR)
+    ax.set_title("Workout Time Distribution", color='white')
+    ax.set_xlabel("Exercise Type", color='white')
+    ax.set_ylabel("Duration (min)", color='white')
+    ax.tick_params(axis='x', colors='white')
+    ax.tick_params(axis='y', colors='white')
+    ax.spines['bottom'].set_color('white')
+    ax.spines['left'].set_color('white')
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+    fig.tight_layout()
+    return _png_bytes(fig)
+
+
+CHARTS = {
+    'macros_donut': ({'svg': macros_donut_svg, 'png': macros_donut_png}, 2),
+    'workout_bars': ({'svg': workout_bars_svg, 'png': workout_bars_png}, 1),
+}
+
+
+def chart_key(kind, values, fmt):
+    # Charts are drawn from their values rounded to the kind's precision, so
+    # the rounded values identify the image
+    _, digits = CHARTS[kind]
+    return kind, fmt, tuple((label, round(float(value), digits)) for label, value in values.items())
+
+
+def chart_etag(kind, values, fmt):
+    # Known without rendering, so a revalidation is answered with a 304 only
+    key = (CHART_VERSION,) + chart_key(kind, values, fmt)
+    return hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+
+
+def chart_html(url, alt, style):
+    return f'<img src="{html.escape(url)}" alt="{html.escape(alt)}" style="{style}" />'
+
+
+class ChartService:
+    # Renders charts in a small thread pool and caches them by chart kind and
+    # rounded values. The cache holds futures, and the lookup and the insert
+    # happen under one lock, so a chart that is still being rendered is shared
+    # by every request asking for it. submit() returns
+    # straight away; callers build the rest of their page and then wait on
+    # the future.
+
+    def __init__(self, workers=CHART_WORKERS, cache_size=CHART_CACHE_SIZE):
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix="chart")
+        self.cache = LRUCache(cache_size)
+        self.lock = threading.Lock()
+
+    def submit(self, kind, values, fmt=CHART_FORMAT):
+        key = chart_key(kind, values, fmt)
+        with self.lock:
+            future = self.cache.get(key)
+            submitted = future is None
+            if submitted:
+                future = self.pool.submit(CHARTS[kind][0][fmt], dict(key[2]))
+                self.cache.put(key, future)
+
+        if submitted:
+            # Failed renders are not cached
+            def discard_failed(done):
+                if done.exception() is not None:
+                    self.cache.discard(key)
+
+            future.add_done_callback(discard_failed)
+        return future
+
+    def render(self, kind, values, fmt=CHART_FORMAT):
+        return self.submit(kind, values, fmt).result()
+
+    def stats(self):
+        return self.cache.stats()
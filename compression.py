@@ -0,0 +1,63 @@
+
+import gzip
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Text responses are compressed in an after_request hook, with brotli when
+# the package is installed and the client accepts it, gzip otherwise.
+# Streamed responses (NDJSON) are left alone. A compressed body is a different
+# representation, so a strong ETag gets the encoding appended.
+COMPRESS_MIMETYPES = {'text/html', 'application/json', 'image/svg+xml'}
+COMPRESS_MIN_SIZE = 500
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+ENCODINGS = ['br', 'gzip']
+
+
+def encoded_etag(etag, encoding):
+    return f"{etag}-{encoding}"
+
+
+def matching_etag(etag, if_none_match):
+    # The tag of the representation the client already has: the plain one or
+    # one of its encodings, or None
+    for tag in [etag] + [encoded_etag(etag, encoding) for encoding in ENCODINGS]:
+        if if_none_match.contains(tag):
+            return tag
+    return None
+
+
+def compress_response(response, accept_encodings):
+    if (response.status_code != 200 or response.is_streamed or response.direct_passthrough
+            or response.mimetype not in COMPRESS_MIMETYPES or 'Content-Encoding' in response.headers):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+
+    if brotli is not None and accept_encodings['br']:
+        response.set_data(brotli.compress(data, quality=BROTLI_QUALITY))
+        response.headers['Content-Encoding'] = 'br'
+    elif accept_encodings['gzip']:
+        response.set_data(gzip.compress(data, GZIP_LEVEL))
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        return response
+
+    etag, weak = response.get_etag()
+    if etag is not None and not weak:
+        response.set_etag(encoded_etag(etag, response.headers['Content-Encoding']))
+    return response
+
+
+def init_compression(app):
+    @app.after_request
+    def compress(response):
+        return compress_response(response, request.accept_encodings)
@@ -0,0 +1,355 @@
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+DATA_DIR = "data"
+# Columnar copy of the tables: one .npy file per column, opened memory-mapped
+# so every worker process shares the same page-cache copy
+STORE_DIR = os.path.join(DATA_DIR, "store")
+
+# Normalized tables written by pipeline.py (as a store, optionally as CSV). Food log rows reference
+# the food catalog by food_id; exercise rows reference the user profile
+# (body stats and derived goal/BMI category/fitness level/diet type) that
+# was recorded with them by profile_id.
+TABLE_COLUMNS = {
+    'food_catalog': [
+        'food_id', 'Food_Item', 'Category', 'Calories (kcal)', 'Protein (g)', 'Carbohydrates (g)', 'Fat (g)',
+        'Fiber (g)', 'Sugars (g)', 'Sodium (mg)', 'Cholesterol (mg)'
+    ],
+    'food_log': ['Date', 'User_ID', 'food_id', 'Meal_Type', 'Water_Intake (ml)'],
+    'exercise_catalog': [
+        'exercise_id', 'profile_id', 'User_ID', 'Exercise', 'Calories Burned', 'Duration', 'Heart Rate',
+        'Exercise Intensity', 'Weather Conditions'
+    ],
+    'user_profile': [
+        'profile_id', 'User_ID', 'Age', 'Gender', 'Dream Weight', 'Actual Weight', 'BMI',
+        'Goal', 'BMI_Category', 'Fitness_Level', 'Diet_Type'
+    ],
+}
+TABLES = list(TABLE_COLUMNS)
+
+# Columns MinMax-scaled within their own table
+SCALED_COLUMNS = {
+    'food_catalog': [
+        'Calories (kcal)', 'Protein (g)', 'Carbohydrates (g)', 'Fat (g)',
+        'Fiber (g)', 'Sugars (g)', 'Sodium (mg)', 'Cholesterol (mg)'
+    ],
+    'food_log': ['Water_Intake (ml)'],
+    'exercise_catalog': ['Calories Burned', 'Duration', 'Heart Rate'],
+    'user_profile': ['Dream Weight', 'Actual Weight', 'BMI'],
+}
+
+# String columns with a handful of distinct values are stored as categoricals
+CATEGORICAL_COLUMNS = [
+    'Food_Item', 'Category', 'Meal_Type', 'Exercise', 'Gender', 'Weather Conditions',
+    'Goal', 'BMI_Category', 'Fitness_Level', 'Diet_Type'
+]
+# Integer columns; every other numeric column is stored as float32. Values
+# outside a column's range are rejected by the store writer.
+INTEGER_COLUMNS = {
+    'User_ID': 'int32', 'food_id': 'int32', 'exercise_id': 'int32', 'profile_id': 'int32',
+    'Exercise Intensity': 'int16', 'Age': 'int16'
+}
+
+FOOD_COLUMNS = TABLE_COLUMNS['food_catalog'][1:]
+
+# Appending leaves a table in parts until it has more than this many, then
+# close() compacts it into one (a full build always writes one part)
+STORE_MAX_PARTS = 16
+
+
+def column_dtypes(columns):
+    dtype = {}
+    for col in columns:
+        if col in CATEGORICAL_COLUMNS:
+            dtype[col] = 'category'
+        elif col in INTEGER_COLUMNS:
+            dtype[col] = INTEGER_COLUMNS[col]
+        elif col != 'Date':
+            dtype[col] = 'float32'
+    return dtype
+
+
+def table_path(name, directory=DATA_DIR):
+    return os.path.join(directory, f"{name}.csv")
+
+
+def load_csv_table(name, columns=None, directory=DATA_DIR):
+    # Read only the requested columns, with compact dtypes
+    usecols = TABLE_COLUMNS[name] if columns is None else [col for col in TABLE_COLUMNS[name] if col in columns]
+    parse_dates = ['Date'] if 'Date' in usecols else False
+    return pd.read_csv(table_path(name, directory), usecols=usecols, dtype=column_dtypes(usecols), parse_dates=parse_dates)
+
+
+def load_csv_tables(names=TABLES, directory=DATA_DIR):
+    return {name: load_csv_table(name, directory=directory) for name in names}
+
+
+def _codes_dtype(n_categories):
+    # Same integer width pandas picks for categorical codes, so that
+    # Categorical.from_codes can use the memory-mapped array without a copy
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories < np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def _generation_dir(meta):
+    # Each rewrite of a table goes to a new generation directory; stores
+    # written before generations existed keep their parts in the table directory
+    return f"gen-{meta['generation']:05d}" if 'generation' in meta else ""
+
+
+def _column_path(directory, name, meta, part, position):
+    return os.path.join(directory, name, _generation_dir(meta), f"part-{part:05d}", f"{position:02d}.npy")
+
+
+def _meta_path(directory, name):
+    return os.path.join(directory, name, "meta.json")
+
+
+def _integer_array(values, name, dtype):
+    # numpy wraps out-of-range integers around silently, which would corrupt
+    # ids used as join keys
+    array = values.to_numpy()
+    info = np.iinfo(dtype)
+    if len(array) and (array.min() < info.min or array.max() > info.max):
+        raise ValueError(f"{name} has values outside the {dtype} range [{info.min}, {info.max}]")
+    return array.astype(dtype)
+
+
+def _encode_categories(values, categories):
+    # Categories only ever grow at the end, so codes in parts written earlier
+    # stay valid when later parts bring new values
+    values = pd.Series(values).astype(object)
+    present = values.dropna().astype(str)
+    categories.extend(sorted(set(present.unique()) - set(categories)))
+    codes = pd.Categorical(present.reindex(values.index), categories=categories).codes
+    return codes.astype(_codes_dtype(len(categories)))
+
+
+class StoreWriter:
+    # Writes a store table one part at a time. meta.json names the table's
+    # generation directory and how many parts of it are complete, and is only
+    # ever replaced atomically, so readers always find a complete table: a new
+    # table is written to a new generation, and appended parts only count once
+    # close() has written meta.json. The previous generation is kept for
+    # readers that read meta.json just before the switch; older ones are
+    # removed. load_table uses a single-part table memory-mapped but
+    # concatenates the parts of any other, so a new table is compacted into
+    # one part on close, and an appended one once it has more than max_parts
+    # parts: appends only write their own rows until then.
+
+    def __init__(self, name, directory=STORE_DIR, append=False, max_parts=STORE_MAX_PARTS):
+        self.name = name
+        self.directory = directory
+        self.max_parts = max_parts
+        self.table_dir = os.path.join(directory, name)
+        self.previous = read_store_meta(name, directory) if os.path.exists(_meta_path(directory, name)) else None
+        self.appending = append and self.previous is not None
+        if self.appending:
+            self.meta = dict(self.previous)
+        else:
+            self.meta = {'columns': [], 'parts': [], 'checksum': '', 'generation': self._next_generation(self.previous)}
+            for col in TABLE_COLUMNS[name]:
+                self.meta['columns'].append({'name': col, 'categories': []} if col in CATEGORICAL_COLUMNS else {'name': col})
+
+    def _next_generation(self, meta):
+        generation = meta.get('generation', -1) + 1 if meta is not None else 0
+        # Left over from a build that did not finish
+        shutil.rmtree(os.path.join(self.table_dir, f"gen-{generation:05d}"), ignore_errors=True)
+        return generation
+
+    def _part_dir(self, meta, part):
+        return os.path.join(self.table_dir, _generation_dir(meta), f"part-{part:05d}")
+
+    def append(self, table):
+        part_dir = self._part_dir(self.meta, len(self.meta['parts']))
+        os.makedirs(part_dir, exist_ok=True)
+
+        # The checksum chains over parts, so appending does not re-read old data
+        sha = hashlib.sha256(self.meta['checksum'].encode())
+        for position, column in enumerate(self.meta['columns']):
+            values = table[column['name']]
+            if 'categories' in column:
+                array = _encode_categories(values, column['categories'])
+            elif column['name'] == 'Date':
+                array = pd.to_datetime(values).to_numpy(dtype='datetime64[ns]')
+            elif column['name'] in INTEGER_COLUMNS:
+                array = _integer_array(values, column['name'], INTEGER_COLUMNS[column['name']])
+            else:
+                array = values.to_numpy(dtype=column_dtypes([column['name']])[column['name']])
+            np.save(os.path.join(part_dir, f"{position:02d}.npy"), array)
+            sha.update(array.tobytes())
+
+        self.meta['parts'].append(len(table))
+        self.meta['checksum'] = sha.hexdigest()
+
+    def compact(self):
+        # The parts are copied into part 0 of a new generation. The checksum
+        # is kept: it identifies the data, not its layout.
+        compacted = dict(self.meta, parts=[sum(self.meta['parts'])], generation=self._next_generation(self.meta))
+        os.makedirs(self._part_dir(compacted, 0))
+        for position, column in enumerate(self.meta['columns']):
+            parts = [
+                np.load(os.path.join(self._part_dir(self.meta, part), f"{position:02d}.npy"), mmap_mode='r')
+                for part in range(len(self.meta['parts']))
+            ]
+            # Codes written before the categories grew are widened here
+            dtype = _codes_dtype(len(column['categories'])) if 'categories' in column else np.result_type(*parts)
+            array = np.lib.format.open_memmap(
+                os.path.join(self._part_dir(compacted, 0), f"{position:02d}.npy"),
+                mode='w+', dtype=dtype, shape=(compacted['parts'][0],)
+            )
+            start = 0
+            for part in parts:
+                array[start:start + len(part)] = part
+                start += len(part)
+            array.flush()
+            del array, parts
+        self.meta = compacted
+
+    def close(self):
+        if len(self.meta['parts']) > (self.max_parts if self.appending else 1):
+            self.compact()
+
+        meta_path = _meta_path(self.directory, self.name)
+        os.makedirs(self.table_dir, exist_ok=True)
+        with open(meta_path + ".tmp", 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(meta_path + ".tmp", meta_path)
+
+        keep = {"meta.json", _generation_dir(self.meta)}
+        if self.previous is not None:
+            keep.add(_generation_dir(self.previous))
+        for entry in os.listdir(self.table_dir):
+            # part-* entries are a table written before generations existed,
+            # kept while it is the current or the previous one
+            legacy = entry.startswith("part-") and "" in keep
+            if entry in keep or legacy:
+                continue
+            path = os.path.join(self.table_dir, entry)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+
+
+def compact_store_table(name, directory=STORE_DIR):
+    # Merge the parts appended since the last compaction; returns how many
+    # parts the table had
+    writer = StoreWriter(name, directory, append=True, max_parts=1)
+    parts = len(writer.meta['parts'])
+    if parts > 1:
+        writer.close()
+    return parts
+
+
+def write_store_table(table, name, directory=STORE_DIR):
+    writer = StoreWriter(name, directory)
+    writer.append(table)
+    writer.close()
+
+
+def write_store(tables, directory=STORE_DIR):
+    for name, table in tables.items():
+        write_store_table(table, name, directory)
+
+
+def read_store_meta(name, directory=STORE_DIR):
+    with open(_meta_path(directory, name)) as f:
+        return json.load(f)
+
+
+def load_table(name, columns=None, directory=STORE_DIR):
+    # Columns are memory-mapped, not read; a single-part table is used
+    # without copying, the parts of an appended one are concatenated
+    meta = read_store_meta(name, directory)
+    data = {}
+    for position, column in enumerate(meta['columns']):
+        if columns is not None and column['name'] not in columns:
+            continue
+        parts = [
+            np.load(_column_path(directory, name, meta, part, position), mmap_mode='r')
+            for part in range(len(meta['parts']))
+        ]
+        array = parts[0] if len(parts) == 1 else np.concatenate(parts)
+        if 'categories' in column:
+            array = pd.Categorical.from_codes(array, categories=column['categories'], validate=False)
+        data[column['name']] = array
+    return pd.DataFrame(data, copy=False)
+
+
+def load_tables(names=TABLES, directory=STORE_DIR):
+    return {name: load_table(name, directory=directory) for name in names}
+
+
+def tables_checksum(directory=STORE_DIR):
+    sha = hashlib.sha256()
+    for name in TABLES:
+        sha.update(read_store_meta(name, directory)['checksum'].encode())
+    return sha.hexdigest()
+
+
+def tables_mtime(directory=STORE_DIR):
+    paths = [_meta_path(directory, name) for name in TABLES]
+    if not all(os.path.exists(path) for path in paths):
+        return None
+    return max(os.path.getmtime(path) for path in paths)
+
+
+def food_frame(tables):
+    # Every logged food with its meal type, in food log order
+    frame = tables['food_log'][['food_id', 'Meal_Type']].merge(tables['food_catalog'], on='food_id', how='left')
+    return frame[['Meal_Type'] + FOOD_COLUMNS]
+
+
+def meal_frame(tables):
+    # Food log rows with their food and the (goal, diet type) pairs recorded
+    # for the user, in food log order
+    profiles = tables['user_profile'][['User_ID', 'Goal', 'Diet_Type']].drop_duplicates()
+    frame = tables['food_log'][['User_ID', 'food_id', 'Meal_Type']].merge(profiles, on='User_ID', how='inner')
+    frame = frame.merge(tables['food_catalog'], on='food_id', how='left')
+    return frame[['Goal', 'Diet_Type', 'Meal_Type'] + FOOD_COLUMNS]
+
+
+def exercise_frame(tables):
+    # Exercise rows with the goal recorded alongside them
+    profiles = tables['user_profile'][['profile_id', 'Goal']]
+    return tables['exercise_catalog'].merge(profiles, on='profile_id', how='left')
+
+
+def calories_training_frame(tables):
+    profiles = tables['user_profile'][['profile_id', 'BMI_Category', 'Fitness_Level']]
+    return tables['exercise_catalog'].merge(profiles, on='profile_id', how='left')
+
+
+def macros_training_frame(tables):
+    profiles = tables['user_profile'][['User_ID', 'Diet_Type', 'BMI_Category']].drop_duplicates()
+    frame = tables['food_log'][['User_ID', 'food_id', 'Meal_Type']].merge(profiles, on='User_ID', how='inner')
+    return frame.merge(tables['food_catalog'], on='food_id', how='left')
+
+
+def memory_usage_mb(df):
+    return df.memory_usage(deep=True).sum() / 2 ** 20
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Inspect the normalized tables or rebuild the columnar store from the CSV tables.")
+    parser.add_argument('command', nargs='?', choices=['info', 'build-store'], default='info')
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--store-dir', default=STORE_DIR)
+    args = parser.parse_args()
+
+    if args.command == 'build-store':
+        write_store(load_csv_tables(directory=args.data_dir), args.store_dir)
+        print(f"Wrote {len(TABLES)} tables to {args.store_dir}")
+    else:
+        for name, table in load_tables(directory=args.store_dir).items():
+            print(f"{name:<18} {len(table):>8} rows {memory_usage_mb(table):8.2f} MB")
@@ -0,0 +1,134 @@
+
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from flat_forest import MODEL_DIR, model_version
+
+# Bumped whenever the saved layout or the encoding changes; pipelines saved
+# with another version are rejected instead of silently mis-encoding
+SCHEMA_VERSION = 1
+
+# Per-column encoders and feature list each model was saved with before
+# FeaturePipeline existed
+LEGACY_FILES = {
+    "calories_burned_model": (["BMI_Category", "Fitness_Level"], "feature_columns.pkl"),
+    "macros_model": (["Meal_Type", "Diet_Type", "BMI_Category"], "macros_feature_columns.pkl"),
+}
+
+
+class FeaturePipeline:
+    # Turns raw inputs into a model's feature matrix: columns in training
+    # order, categoricals replaced by their code (sorted categories, as
+    # LabelEncoder assigns them). The category -> code dicts are compiled
+    # once, so encoding a row is a dict lookup per column, and transform()
+    # encodes a whole DataFrame in one vectorized pass. Saved next to its
+    # model, with the version of the model it was fitted with.
+
+    def __init__(self, feature_cols, categories, model_version=None, schema_version=SCHEMA_VERSION):
+        self.feature_cols = list(feature_cols)
+        self.categories = {col: list(values) for col, values in categories.items()}
+        self.model_version = model_version
+        self.schema_version = schema_version
+        self.codes = {col: {value: code for code, value in enumerate(values)} for col, values in self.categories.items()}
+
+    @classmethod
+    def fit(cls, X, categorical_cols):
+        categories = {col: sorted(X[col].dropna().astype(str).unique()) for col in categorical_cols}
+        return cls(X.columns, categories)
+
+    @classmethod
+    def from_encoders(cls, feature_cols, encoders):
+        # Pipeline equivalent to per-column LabelEncoders
+        return cls(feature_cols, {col: encoder.classes_.tolist() for col, encoder in encoders.items()})
+
+    def encode_row(self, data):
+        # data maps column -> submitted value; unknown categories raise
+        # ValueError, like LabelEncoder.transform
+        row = []
+        for col in self.feature_cols:
+            value = data[col]
+            if col in self.codes:
+                code = self.codes[col].get(value)
+                if code is None:
+                    raise ValueError(f"{col} contains previously unseen label: {value!r}")
+                row.append(code)
+            else:
+                row.append(float(value))
+        return row
+
+    def transform(self, X):
+        columns = {}
+        for col in self.feature_cols:
+            if col in self.codes:
+                codes = pd.Categorical(X[col], categories=self.categories[col]).codes
+                if (codes < 0).any():
+                    raise ValueError(f"{col} contains previously unseen labels")
+                columns[col] = codes.astype(np.float64)
+            else:
+                columns[col] = X[col].to_numpy(dtype=np.float64)
+        return pd.DataFrame(columns, index=X.index)
+
+    def encode(self, X):
+        # Like transform(), but rows with an unknown category or a missing or
+        # non-numeric value are left out instead of raising. Returns the
+        # float64 feature matrix of the valid rows and the mask of them.
+        columns, valid = [], np.ones(len(X), dtype=bool)
+        for col in self.feature_cols:
+            if col not in X:
+                return np.empty((0, len(self.feature_cols))), np.zeros(len(X), dtype=bool)
+            if col in self.codes:
+                values = X[col].where(X[col].map(type) == str)
+                codes = pd.Categorical(values, categories=self.categories[col]).codes
+                valid &= codes >= 0
+                columns.append(codes.astype(np.float64))
+            else:
+                values = X[col].where(X[col].map(lambda value: type(value) in (int, float, str)))
+                values = pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64)
+                valid &= np.isfinite(values)
+                columns.append(values)
+        return np.column_stack(columns)[valid], valid
+
+    def save(self, path):
+        joblib.dump({
+            "schema_version": self.schema_version,
+            "model_version": self.model_version,
+            "feature_cols": self.feature_cols,
+            "categories": self.categories,
+        }, path)
+
+    @classmethod
+    def load(cls, path):
+        state = joblib.load(path)
+        if state.get("schema_version") != SCHEMA_VERSION:
+            raise ValueError(f"{path}: feature schema {state.get('schema_version')}, expected {SCHEMA_VERSION}")
+        return cls(state["feature_cols"], state["categories"], state["model_version"], state["schema_version"])
+
+
+def features_path(name, directory=MODEL_DIR):
+    return os.path.join(directory, f"{name}_features.pkl")
+
+
+def save_feature_pipeline(features, name, directory=MODEL_DIR):
+    # Call after saving the model, so the pipeline records its version
+    features.model_version = model_version(name, directory)
+    features.save(features_path(name, directory))
+
+
+def load_feature_pipeline(name, directory=MODEL_DIR):
+    # The pipeline saved with the model. Model folders from before it existed
+    # only have per-column encoder pickles and a feature list; those are
+    # wrapped as they are (retrain to get separate encoders per model).
+    path = features_path(name, directory)
+    if os.path.exists(path):
+        features = FeaturePipeline.load(path)
+        if features.model_version != model_version(name, directory):
+            raise ValueError(f"{path} was saved for another version of {name}; retrain or re-save its feature pipeline")
+        return features
+
+    encoder_cols, features_file = LEGACY_FILES[name]
+    feature_cols = joblib.load(os.path.join(directory, features_file))
+    encoders = {col: joblib.load(os.path.join(directory, f"{col}_encoder.pkl")) for col in encoder_cols}
+    return FeaturePipeline.from_encoders(feature_cols, encoders)
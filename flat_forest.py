@@ -0,0 +1,168 @@
+
+import argparse
+import hashlib
+import os
+import threading
+
+import joblib
+import numpy as np
+
+MODEL_DIR = "prediction_utils"
+MODELS = ["calories_burned_model", "macros_model"]
+# Largest batch predicted with the flat arrays. They beat sklearn by 10-20x on
+# one row but fall behind at a few dozen rows, where sklearn's per-tree C
+# loops take over (benchmarks/bench_flat_forest.py).
+FLAT_MAX_ROWS = 32
+
+# model_version() hashes, keyed by (path, size, mtime), so a pickle is only
+# read again after it changed on disk
+_versions = {}
+_versions_lock = threading.Lock()
+
+
+class FlatForest:
+    # A fitted sklearn forest (or single tree) regressor flattened into
+    # contiguous arrays: every node of every tree gets a global index, and
+    # feature / threshold / left / right / value are indexed by it. Leaves
+    # point to themselves with an infinite threshold, so predict() moves all
+    # (row, tree) pairs one level down per step for max_depth steps with no
+    # per-node branching. Inputs are compared as float32, like sklearn does,
+    # so every row lands on the same leaves as in model.predict().
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth, feature_names=None, model_version=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.feature_names = feature_names
+        self.model_version = model_version
+
+    @classmethod
+    def from_model(cls, model):
+        estimators = getattr(model, "estimators_", [model])
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        for estimator in estimators:
+            tree = estimator.tree_
+            nodes = np.arange(tree.node_count)
+            leaf = tree.children_left == -1
+            features.append(np.where(leaf, 0, tree.feature))
+            thresholds.append(np.where(leaf, np.inf, tree.threshold))
+            lefts.append(np.where(leaf, nodes, tree.children_left) + offset)
+            rights.append(np.where(leaf, nodes, tree.children_right) + offset)
+            values.append(tree.value[:, :, 0])
+            roots.append(offset)
+            offset += tree.node_count
+
+        feature_names = getattr(model, "feature_names_in_", None)
+        return cls(
+            np.concatenate(features).astype(np.int32),
+            np.concatenate(thresholds).astype(np.float64),
+            np.concatenate(lefts).astype(np.int32),
+            np.concatenate(rights).astype(np.int32),
+            np.ascontiguousarray(np.concatenate(values), dtype=np.float64),
+            np.array(roots, dtype=np.int32),
+            max(estimator.tree_.max_depth for estimator in estimators),
+            None if feature_names is None else [str(name) for name in feature_names],
+        )
+
+    def apply(self, X):
+        # Leaf index of every (row, tree) pair
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), len(self.roots)))
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def predict(self, X):
+        # Same shape as model.predict(): (n,) for one output, (n, outputs) otherwise
+        prediction = self.value[self.apply(X)].mean(axis=1)
+        return prediction[:, 0] if prediction.shape[1] == 1 else prediction
+
+    def save(self, path):
+        np.savez(
+            path, feature=self.feature, threshold=self.threshold, left=self.left, right=self.right,
+            value=self.value, roots=self.roots, max_depth=self.max_depth,
+            feature_names=np.array(self.feature_names or [], dtype=str),
+            model_version=np.array(self.model_version or ""),
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            return cls(
+                arrays["feature"], arrays["threshold"], arrays["left"], arrays["right"], arrays["value"],
+                arrays["roots"], arrays["max_depth"], arrays["feature_names"].tolist() or None,
+                str(arrays["model_version"]) if "model_version" in arrays else None,
+            )
+
+
+class ForestModel:
+    # The flattened forest for single rows and small batches (the form routes
+    # and the micro-batcher), the sklearn model for larger ones (the API)
+
+    def __init__(self, forest, model, max_flat_rows=FLAT_MAX_ROWS):
+        self.forest = forest
+        self.model = model
+        self.max_flat_rows = max_flat_rows
+
+    def predict(self, X):
+        if len(X) <= self.max_flat_rows:
+            return self.forest.predict(X)
+        return self.model.predict(X)
+
+
+def flat_path(name, directory=MODEL_DIR):
+    return os.path.join(directory, f"{name}.npz")
+
+
+def export_model(name, directory=MODEL_DIR):
+    forest = FlatForest.from_model(joblib.load(os.path.join(directory, f"{name}.pkl")))
+    forest.model_version = model_version(name, directory)
+    forest.save(flat_path(name, directory))
+    return forest
+
+
+def model_version(name, directory=MODEL_DIR):
+    # sha256 of the model pickle: changes when the model is retrained, but not
+    # when the folder is copied or moved (which resets mtimes)
+    path = os.path.join(directory, f"{name}.pkl")
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _versions_lock:
+        if key not in _versions:
+            sha = hashlib.sha256()
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    sha.update(block)
+            _versions[key] = sha.hexdigest()[:16]
+        return _versions[key]
+
+
+def load_model(name, directory=MODEL_DIR, max_flat_rows=FLAT_MAX_ROWS):
+    # The sklearn model, paired with the flattened forest for small batches
+    # when that was exported from the current pickle
+    model = joblib.load(os.path.join(directory, f"{name}.pkl"))
+    npz_path = flat_path(name, directory)
+    if max_flat_rows > 0 and os.path.exists(npz_path):
+        forest = FlatForest.load(npz_path)
+        if forest.model_version == model_version(name, directory):
+            return ForestModel(forest, model, max_flat_rows)
+    return model
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export the trained forests as flat arrays for the Flask predictor.")
+    parser.add_argument('models', nargs='*', default=MODELS)
+    parser.add_argument('--model-dir', default=MODEL_DIR)
+    args = parser.parse_args()
+
+    for name in args.models:
+        forest = export_model(name, args.model_dir)
+        print(f"Wrote {flat_path(name, args.model_dir)}: {len(forest.roots)} trees, "
+              f"{len(forest.feature)} nodes, depth {forest.max_depth}")
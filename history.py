@@ -0,0 +1,117 @@
+
+import itertools
+import json
+import os
+import sqlite3
+import threading
+
+from cache import LRUCache
+
+# Recommendation history kept on the server, keyed by a random per-browser
+# token (the only thing stored in the session cookie). Entries are the
+# compact answer-table keys of a recommendation, newest first, so pages are
+# re-rendered from the current answers instead of storing their HTML.
+HISTORY_BACKENDS = ["memory", "sqlite"]
+HISTORY_BACKEND = "memory"
+HISTORY_DEPTH = 2
+HISTORY_MAX_USERS = 10000
+HISTORY_DB = "recommendation_history.sqlite"
+# "Show Last Recommendation" shows the entry before the latest one
+HISTORY_MIN_DEPTH = 2
+# SQLiteHistory drops the users beyond max_users once every this many pushes
+HISTORY_PRUNE_INTERVAL = 100
+
+
+class MemoryHistory:
+    # Per-process history; the least recently seen users are dropped once
+    # more than max_users have one
+
+    def __init__(self, depth=HISTORY_DEPTH, max_users=HISTORY_MAX_USERS):
+        self.depth = depth
+        self.users = LRUCache(max_users)
+        self.lock = threading.Lock()
+
+    def push(self, token, entry):
+        with self.lock:
+            entries = self.users.get(token) or ()
+            self.users.put(token, ((entry,) + entries)[:self.depth])
+
+    def recent(self, token):
+        return list(self.users.get(token) or ())
+
+    def stats(self):
+        return dict(self.users.stats(), backend="memory", depth=self.depth)
+
+
+class SQLiteHistory:
+    # History shared by every worker process on the host and kept across
+    # restarts. Each thread uses its own connection. Rows get increasing ids,
+    # so a user's newest id says when they last got a recommendation; every
+    # prune_interval pushes, the users beyond the max_users most recent ones
+    # are deleted.
+
+    def __init__(self, path=HISTORY_DB, depth=HISTORY_DEPTH, max_users=HISTORY_MAX_USERS,
+                 prune_interval=HISTORY_PRUNE_INTERVAL):
+        self.path = path
+        self.depth = depth
+        self.max_users = max_users
+        self.prune_interval = prune_interval
+        self.pushes = itertools.count(1)
+        self.local = threading.local()
+        with self.connection() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS history ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, token TEXT NOT NULL, entry TEXT NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS history_token ON history (token, id)")
+
+    def connection(self):
+        db = getattr(self.local, "db", None)
+        if db is None:
+            db = self.local.db = sqlite3.connect(self.path, timeout=10)
+            db.execute("PRAGMA journal_mode=WAL")
+        return db
+
+    def push(self, token, entry):
+        with self.connection() as db:
+            db.execute("INSERT INTO history (token, entry) VALUES (?, ?)", (token, json.dumps(entry)))
+            db.execute(
+                "DELETE FROM history WHERE token = ? AND id NOT IN "
+                "(SELECT id FROM history WHERE token = ? ORDER BY id DESC LIMIT ?)",
+                (token, token, self.depth),
+            )
+        if next(self.pushes) % self.prune_interval == 0:
+            self.prune()
+
+    def prune(self):
+        with self.connection() as db:
+            db.execute(
+                "DELETE FROM history WHERE token IN (SELECT token FROM history "
+                "GROUP BY token ORDER BY MAX(id) DESC LIMIT -1 OFFSET ?)",
+                (self.max_users,),
+            )
+
+    def recent(self, token):
+        rows = self.connection().execute(
+            "SELECT entry FROM history WHERE token = ? ORDER BY id DESC LIMIT ?", (token, self.depth)
+        )
+        return [json.loads(entry) for entry, in rows]
+
+    def stats(self):
+        users, = self.connection().execute("SELECT COUNT(DISTINCT token) FROM history").fetchone()
+        return {"backend": "sqlite", "depth": self.depth, "size": users, "max_size": self.max_users}
+
+
+def history_store(backend=None, depth=None):
+    # Configured by HISTORY_BACKEND (memory|sqlite), HISTORY_DEPTH,
+    # HISTORY_MAX_USERS and HISTORY_DB
+    backend = backend or os.environ.get("HISTORY_BACKEND", HISTORY_BACKEND)
+    depth = depth or int(os.environ.get("HISTORY_DEPTH", HISTORY_DEPTH))
+    if depth < HISTORY_MIN_DEPTH:
+        raise ValueError(f"History depth must be at least {HISTORY_MIN_DEPTH}, got {depth}")
+    max_users = int(os.environ.get("HISTORY_MAX_USERS", HISTORY_MAX_USERS))
+    if backend == "sqlite":
+        return SQLiteHistory(os.environ.get("HISTORY_DB", HISTORY_DB), depth, max_users)
+    if backend == "memory":
+        return MemoryHistory(depth, max_users)
+    raise ValueError(f"Unknown history backend {backend!r}, expected one of {HISTORY_BACKENDS}")
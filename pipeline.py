@@ -0,0 +1,274 @@
+
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from dataset import (
+    DATA_DIR, STORE_DIR, TABLES, TABLE_COLUMNS, SCALED_COLUMNS, FOOD_COLUMNS, StoreWriter, compact_store_table,
+    table_path,
+    load_tables, tables_checksum
+)
+from recommender import (
+    BMI_CATEGORIES, FITNESS_LEVELS, DIET_TYPES, ANSWERS_PATH, load_answer_table, save_answer_table,
+    update_answer_table
+)
+
+FOOD_LOG_PATH = "daily_food_nutrition_dataset.csv"
+EXERCISE_PATH = "exercise_dataset.csv"
+CHUNKSIZE = 100_000
+SEED = 42
+
+# Persisted min/max of every scaled column, so later runs scale new rows
+# exactly like the data already in the store
+SCALING_FILE = "scaling.json"
+# Running min/max including rows ingested since the last full build. Scaling
+# is not refitted on ingest; a full rebuild picks these ranges up.
+OBSERVED_FILE = "observed_ranges.json"
+# Hash of every catalog food in food_id order, so ingest can assign ids that
+# continue the ones in the store
+FOOD_HASHES_FILE = "food_hashes.npy"
+FOOD_TABLES = ['food_catalog', 'food_log']
+
+
+def read_food_chunks(path=FOOD_LOG_PATH, chunksize=CHUNKSIZE):
+    for chunk in pd.read_csv(path, chunksize=chunksize, parse_dates=['Date']):
+        yield chunk
+
+
+def read_exercise_chunks(path=EXERCISE_PATH, chunksize=CHUNKSIZE):
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        yield chunk.drop(columns=['ID']).rename(columns={'Calories Burn': 'Calories Burned'})
+
+
+def derive_goal(dream_weight, actual_weight):
+    diff = dream_weight - actual_weight
+    return np.select([diff.abs() <= 2, diff > 2], ['Maintain', 'Gain'], default='Loss')
+
+
+def derive_bmi_category(bmi):
+    return pd.cut(bmi, bins=[-np.inf, 18.5, 25, 30, np.inf], labels=BMI_CATEGORIES, right=False).astype(object)
+
+
+def synthetic_streams(seed=SEED):
+    # One generator per synthetic column, so drawing chunk by chunk gives the
+    # same values as drawing the whole column at once
+    return {
+        'User_ID': np.random.RandomState(seed),
+        'Fitness_Level': np.random.RandomState(seed),
+        'Diet_Type': np.random.RandomState(seed + 1),
+    }
+
+
+def add_derived_columns(exercise_df, streams):
+    exercise_df['Goal'] = derive_goal(exercise_df['Dream Weight'], exercise_df['Actual Weight'])
+    exercise_df['BMI_Category'] = derive_bmi_category(exercise_df['BMI'])
+    exercise_df['User_ID'] = streams['User_ID'].randint(1, 1001, size=len(exercise_df))
+    exercise_df['Fitness_Level'] = streams['Fitness_Level'].choice(FITNESS_LEVELS, size=len(exercise_df))
+    exercise_df['Diet_Type'] = streams['Diet_Type'].choice(DIET_TYPES, size=len(exercise_df))
+    return exercise_df
+
+
+def update_scaling(scaling, table, chunk):
+    for col in SCALED_COLUMNS[table]:
+        lo, hi = float(chunk[col].min()), float(chunk[col].max())
+        if col in scaling[table]:
+            lo, hi = min(lo, scaling[table][col][0]), max(hi, scaling[table][col][1])
+        scaling[table][col] = [lo, hi]
+
+
+def compute_scaling(food_path=FOOD_LOG_PATH, exercise_path=EXERCISE_PATH, chunksize=CHUNKSIZE):
+    # Single streaming pass over both sources; only the running min/max of
+    # each scaled column is kept in memory
+    scaling = {table: {} for table in SCALED_COLUMNS}
+    for chunk in read_food_chunks(food_path, chunksize):
+        update_scaling(scaling, 'food_catalog', chunk)
+        update_scaling(scaling, 'food_log', chunk)
+    for chunk in read_exercise_chunks(exercise_path, chunksize):
+        update_scaling(scaling, 'exercise_catalog', chunk)
+        update_scaling(scaling, 'user_profile', chunk)
+    return scaling
+
+
+def scale(frame, table, scaling):
+    # Same transform as MinMaxScaler fitted on the whole column
+    for col in SCALED_COLUMNS[table]:
+        lo, hi = scaling[table][col]
+        frame[col] = (frame[col] - lo) / (hi - lo) if hi > lo else 0.0
+    return frame
+
+
+def save_scaling(scaling, store_dir=STORE_DIR, filename=SCALING_FILE):
+    os.makedirs(store_dir, exist_ok=True)
+    with open(os.path.join(store_dir, filename), 'w') as f:
+        json.dump(scaling, f, indent=1)
+
+
+def load_scaling(store_dir=STORE_DIR, filename=SCALING_FILE):
+    with open(os.path.join(store_dir, filename)) as f:
+        return json.load(f)
+
+
+def out_of_range_columns(scaling, observed):
+    # Columns whose observed values fall outside the fitted range, i.e. whose
+    # ingested rows scaled to values below 0 or above 1
+    return [
+        f"{table}.{col}"
+        for table in observed for col, (lo, hi) in observed[table].items()
+        if lo < scaling[table][col][0] or hi > scaling[table][col][1]
+    ]
+
+
+def save_food_hashes(food_ids, store_dir=STORE_DIR):
+    np.save(os.path.join(store_dir, FOOD_HASHES_FILE), np.fromiter(food_ids, dtype=np.uint64, count=len(food_ids)))
+
+
+def load_food_ids(store_dir=STORE_DIR):
+    hashes = np.load(os.path.join(store_dir, FOOD_HASHES_FILE))
+    return dict(zip(hashes.tolist(), range(len(hashes))))
+
+
+def split_food_chunk(chunk, food_ids):
+    # Food catalog rows are identified by a hash of their columns; food_ids
+    # maps hash -> food_id across chunks and is the only state that grows
+    # with the data (one entry per distinct food, not per log row)
+    hashes = pd.Series(pd.util.hash_pandas_object(chunk[FOOD_COLUMNS], index=False).to_numpy())
+    is_new = (hashes.map(food_ids).isna() & ~hashes.duplicated()).to_numpy()
+    food_ids.update(zip(hashes[is_new].tolist(), range(len(food_ids), len(food_ids) + int(is_new.sum()))))
+
+    chunk = chunk.assign(food_id=hashes.map(food_ids).to_numpy())
+    return chunk.loc[is_new, TABLE_COLUMNS['food_catalog']], chunk[TABLE_COLUMNS['food_log']]
+
+
+def split_exercise_chunk(chunk, first_id):
+    ids = np.arange(first_id, first_id + len(chunk))
+    chunk = chunk.assign(exercise_id=ids, profile_id=ids)
+    return chunk[TABLE_COLUMNS['exercise_catalog']], chunk[TABLE_COLUMNS['user_profile']]
+
+
+def write_csv(table, name, csv_dir, header):
+    table.to_csv(table_path(name, csv_dir), mode='w' if header else 'a', header=header, index=False)
+
+
+def run_pipeline(food_path=FOOD_LOG_PATH, exercise_path=EXERCISE_PATH, store_dir=STORE_DIR,
+                 chunksize=CHUNKSIZE, csv_dir=None, seed=SEED):
+    # Pass 1: scaling statistics. Pass 2: split, scale and append every chunk
+    # to the store (one part per chunk). Memory stays bounded by the chunk
+    # size plus the food_id lookup.
+    scaling = compute_scaling(food_path, exercise_path, chunksize)
+    if csv_dir is not None:
+        os.makedirs(csv_dir, exist_ok=True)
+
+    writers = {name: StoreWriter(name, store_dir) for name in TABLES}
+    first = {name: True for name in TABLES}
+
+    def emit(name, table):
+        writers[name].append(table)
+        if csv_dir is not None:
+            write_csv(table, name, csv_dir, first[name])
+        first[name] = False
+
+    food_ids = {}
+    for chunk in read_food_chunks(food_path, chunksize):
+        catalog_rows, log_rows = split_food_chunk(chunk, food_ids)
+        emit('food_catalog', scale(catalog_rows, 'food_catalog', scaling))
+        emit('food_log', scale(log_rows, 'food_log', scaling))
+
+    streams = synthetic_streams(seed)
+    exercise_count = 0
+    for chunk in read_exercise_chunks(exercise_path, chunksize):
+        chunk = add_derived_columns(chunk, streams)
+        exercise_rows, profile_rows = split_exercise_chunk(chunk, exercise_count)
+        exercise_count += len(chunk)
+        emit('exercise_catalog', scale(exercise_rows, 'exercise_catalog', scaling))
+        emit('user_profile', scale(profile_rows, 'user_profile', scaling))
+
+    for writer in writers.values():
+        writer.close()
+    save_scaling(scaling, store_dir)
+    save_scaling(scaling, store_dir, OBSERVED_FILE)
+    save_food_hashes(food_ids, store_dir)
+    return {'foods': len(food_ids), 'exercises': exercise_count}
+
+
+def ingest_food_log(path, store_dir=STORE_DIR, chunksize=CHUNKSIZE, csv_dir=None, answers_path=ANSWERS_PATH):
+    # Append a new food log (e.g. one day of entries) to an existing store.
+    # Rows are scaled with the scaling persisted by the full build, only the
+    # food tables get new parts (compacted once there are more than
+    # STORE_MAX_PARTS), and a current answer table is updated in place
+    # instead of being rebuilt.
+    scaling = load_scaling(store_dir)
+    observed = load_scaling(store_dir, OBSERVED_FILE)
+    food_ids = load_food_ids(store_dir)
+    known_foods = len(food_ids)
+    checksum = tables_checksum(store_dir)
+
+    writers = {name: StoreWriter(name, store_dir, append=True) for name in FOOD_TABLES}
+    new_logs = []
+    for chunk in read_food_chunks(path, chunksize):
+        update_scaling(observed, 'food_catalog', chunk)
+        update_scaling(observed, 'food_log', chunk)
+        catalog_rows, log_rows = split_food_chunk(chunk, food_ids)
+        for name, table in zip(FOOD_TABLES, [catalog_rows, log_rows]):
+            if table.empty:
+                continue
+            table = scale(table, name, scaling)
+            writers[name].append(table)
+            if csv_dir is not None:
+                write_csv(table, name, csv_dir, header=False)
+        new_logs.append(log_rows[['User_ID', 'food_id', 'Meal_Type']])
+
+    for writer in writers.values():
+        writer.close()
+    save_scaling(observed, store_dir, OBSERVED_FILE)
+    save_food_hashes(food_ids, store_dir)
+
+    new_food_log = pd.concat(new_logs) if new_logs else pd.DataFrame(columns=['User_ID', 'food_id', 'Meal_Type'])
+    answers = load_answer_table(answers_path, checksum)
+    if answers is not None:
+        answers = update_answer_table(answers, load_tables(directory=store_dir), new_food_log, tables_checksum(store_dir))
+        save_answer_table(answers, answers_path)
+
+    return {
+        'rows': len(new_food_log),
+        'new_foods': len(food_ids) - known_foods,
+        'answers_updated': answers is not None,
+        'out_of_range': out_of_range_columns(scaling, observed),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Build the normalized data store from the raw food log and exercise CSVs, "
+                    "append a new food log to it (ingest), or merge the parts appended so far (compact)."
+    )
+    parser.add_argument('command', nargs='?', choices=['build', 'ingest', 'compact'], default='build')
+    parser.add_argument('--food-log', default=None, help=f"food log CSV (build default: {FOOD_LOG_PATH})")
+    parser.add_argument('--exercises', default=EXERCISE_PATH)
+    parser.add_argument('--store-dir', default=STORE_DIR)
+    parser.add_argument('--chunksize', type=int, default=CHUNKSIZE)
+    parser.add_argument('--csv-dir', nargs='?', const=DATA_DIR, default=None,
+                        help=f"also write the tables as CSV (default directory: {DATA_DIR})")
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--answers', default=ANSWERS_PATH, help="answer table updated by ingest")
+    args = parser.parse_args()
+
+    if args.command == 'ingest':
+        if args.food_log is None:
+            parser.error("ingest needs --food-log")
+        result = ingest_food_log(args.food_log, args.store_dir, args.chunksize, args.csv_dir, args.answers)
+        print(f"Ingested {result['rows']} food log rows ({result['new_foods']} new foods) into {args.store_dir}")
+        if result['answers_updated']:
+            print(f"Updated {args.answers}")
+        if result['out_of_range']:
+            print("Outside the fitted scaling range (run a full build to refit): " + ", ".join(result['out_of_range']))
+    elif args.command == 'compact':
+        for name in TABLES:
+            parts = compact_store_table(name, args.store_dir)
+            print(f"{name}: {parts} part(s)" + (" compacted into one" if parts > 1 else ""))
+    else:
+        counts = run_pipeline(args.food_log or FOOD_LOG_PATH, args.exercises, args.store_dir, args.chunksize,
+                              args.csv_dir, args.seed)
+        print(f"Wrote {counts['foods']} catalog foods and {counts['exercises']} exercises to {args.store_dir}")
@@ -1,36 +1,382 @@
 
+import argparse
+import itertools
+import os
+
+import joblib
+import numpy as np
 import pandas as pd
 
-def recommend_meals(df, goal, diet_type, meal_type):
-    df_filtered = df[
-        (df['Goal'] == goal) &
-        (df['Diet_Type'] == diet_type) &
-        (df['Meal_Type'] == meal_type) &
+from dataset import STORE_DIR, load_tables, tables_checksum, food_frame, meal_frame, exercise_frame
+
+MEAL_COLUMNS = ['Food_Item', 'Category', 'Calories (kcal)', 'Protein (g)', 'Carbohydrates (g)', 'Fat (g)']
+MEAL_KEY = ['Goal', 'Diet_Type', 'Meal_Type']
+EXERCISE_COLUMNS = ['Exercise', 'Calories Burned', 'Duration', 'Exercise Intensity', 'Heart Rate']
+
+# Every value the recommendation form can submit
+GOALS = ['Loss', 'Gain', 'Maintain']
+DIET_TYPES = ['Balanced', 'Low-Carb', 'High-Protein', 'Vegan']
+MEAL_TYPES = ['Breakfast', 'Lunch', 'Dinner', 'Snack']
+FITNESS_LEVELS = ['Beginner', 'Intermediate', 'Advanced']
+BMI_CATEGORIES = ['Underweight', 'Normal', 'Overweight', 'Obese']
+
+# Scoring targets for rank_meals, in the MinMax-scaled macro space:
+# the goal sets calories, the diet type sets protein / carbohydrates / fat
+MACRO_COLUMNS = ['Calories (kcal)', 'Protein (g)', 'Carbohydrates (g)', 'Fat (g)']
+MACRO_WEIGHTS = np.array([2.0, 1.0, 1.0, 1.0], dtype=np.float32)
+GOAL_CALORIE_TARGETS = {'Loss': 0.25, 'Maintain': 0.5, 'Gain': 0.75}
+DIET_MACRO_TARGETS = {
+    'Balanced': [0.5, 0.5, 0.5],
+    'Low-Carb': [0.6, 0.1, 0.6],
+    'High-Protein': [0.9, 0.4, 0.4],
+    'Vegan': [0.5, 0.6, 0.3],
+}
+NON_VEGAN_CATEGORIES = ['meat', 'dairy', 'eggs']
+
+# Bumped whenever build_answer_table changes what it computes, so artifacts
+# written by older code are rebuilt even if the dataset is unchanged
+ANSWER_TABLE_VERSION = 3
+ANSWERS_PATH = 'recommendation_answers.pkl'
+
+# Profile columns read by the batch API (same names as the form fields)
+MEAL_PROFILE_KEY = ['goal', 'diet_type', 'meal_type']
+EXERCISE_PROFILE_KEY = ['goal', 'fitness_level', 'bmi_category']
+
+
+def build_meal_index(df):
+    # Apply the fixed calorie/carb thresholds once, then split the candidates
+    # by (goal, diet type, meal type) so each lookup is a dict access
+    candidates = df[
         (df['Calories (kcal)'] < 0.35) &
         (df['Carbohydrates (g)'] < 0.3)
     ]
-    
-    return df_filtered[['Food_Item', 'Category', 'Calories (kcal)', 'Protein (g)', 'Carbohydrates (g)', 'Fat (g)']].drop_duplicates().head(5)
 
+    meal_index = {}
+    for key, group in candidates.groupby(MEAL_KEY, sort=False, observed=True):
+        meal_index[key] = group[MEAL_COLUMNS].drop_duplicates()
+    return meal_index
+
+
+def _column_values(column):
+    # Category codes for categoricals (-1 for missing), raw values otherwise
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column.array.codes
+    return column.to_numpy()
+
+
+def _row_codes(values):
+    # Integer codes with the equality drop_duplicates uses: equal values,
+    # strings included, share a code and every missing value is -1
+    if values.dtype.kind == 'i':
+        return values
+    return pd.factorize(values)[0]
+
+
+def _equals(column, value):
+    # column == value as a numpy mask; categoricals compare their codes
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        if value not in column.dtype.categories:
+            return np.zeros(len(column), dtype=bool)
+        return column.array.codes == column.dtype.categories.get_loc(value)
+    return column.to_numpy() == value
+
+
+def _first_distinct(df, mask, columns, k):
+    # Same rows as df[mask][columns].drop_duplicates().head(k), but only the
+    # leading matches are deduplicated, on integer codes of their values: 2k
+    # of them first, twice as many each time duplicates leave fewer than k
+    # distinct rows
+    positions = np.flatnonzero(mask)
+    arrays = [_column_values(df[col]) for col in columns]
+    n = 2 * k
+    while True:
+        leading = positions[:n]
+        rows = np.column_stack([_row_codes(array[leading]) for array in arrays])
+        _, first = np.unique(rows, axis=0, return_index=True)
+        if len(first) >= k or n >= len(positions):
+            return df.iloc[leading[np.sort(first)[:k]], df.columns.get_indexer(columns)]
+        n *= 2
+
+
+def recommend_meals(df, goal, diet_type, meal_type, meal_index=None, k=5):
+    if meal_index is not None:
+        candidates = meal_index.get((goal, diet_type, meal_type))
+        if candidates is None:
+            return pd.DataFrame(columns=MEAL_COLUMNS)
+        return candidates.head(k)
+
+    mask = (
+        _equals(df['Goal'], goal) &
+        _equals(df['Diet_Type'], diet_type) &
+        _equals(df['Meal_Type'], meal_type) &
+        (df['Calories (kcal)'].to_numpy() < 0.35) &
+        (df['Carbohydrates (g)'].to_numpy() < 0.3)
+    )
+    return _first_distinct(df, mask, MEAL_COLUMNS, k)
+
+
+def build_food_catalog(df):
+    # Distinct foods per meal type, with their macros packed into a
+    # contiguous float32 matrix. The weighted squared norm of every row is
+    # precomputed (inf for non-vegan foods in the vegan copy), so scoring a
+    # request is a single matrix-vector product.
+    food_catalog = {}
+    for meal_type, group in df.groupby('Meal_Type', sort=False, observed=True):
+        foods = group[MEAL_COLUMNS].drop_duplicates()
+        macros = np.ascontiguousarray(foods[MACRO_COLUMNS].to_numpy(dtype=np.float32))
+        norms = (macros * macros) @ MACRO_WEIGHTS
+        vegan = ~foods['Category'].astype(str).str.lower().isin(NON_VEGAN_CATEGORIES).to_numpy()
+        food_catalog[meal_type] = {
+            'foods': foods,
+            'macros': macros,
+            'norms': norms,
+            'vegan_norms': np.where(vegan, norms, np.float32(np.inf)),
+        }
+    return food_catalog
+
+
+def macro_target(goal, diet_type):
+    return np.array(
+        [GOAL_CALORIE_TARGETS.get(goal, 0.5)] + DIET_MACRO_TARGETS.get(diet_type, DIET_MACRO_TARGETS['Balanced']),
+        dtype=np.float32
+    )
+
+
+def rank_meals(food_catalog, goal, diet_type, meal_type, k=5):
+    # Rank every food of the meal type by weighted squared distance to the
+    # target macro vector, |x - t|^2 = |x|^2 - 2 x.t + |t|^2, and take the
+    # top k with argpartition
+    entry = food_catalog.get(meal_type)
+    if entry is None:
+        return pd.DataFrame(columns=MEAL_COLUMNS)
+
+    target = macro_target(goal, diet_type) * MACRO_WEIGHTS
+    norms = entry['vegan_norms'] if diet_type == 'Vegan' else entry['norms']
+    distance = norms - entry['macros'] @ (2 * target)
+
+    top = np.arange(len(distance))
+    if len(distance) > k:
+        top = np.argpartition(distance, k - 1)[:k]
+    top = top[np.argsort(distance[top], kind='stable')]
+    top = top[np.isfinite(distance[top])]
+    return entry['foods'].iloc[top]
+
+
+def build_exercise_index(df):
+    # Every filter only looks at columns of the exercise row itself, so the
+    # rows can be deduplicated up front. The table is sorted on intensity for
+    # binary search; 'order' keeps the first-seen position of each row so
+    # results come back in the same order as the unindexed filter.
+    table = df[EXERCISE_COLUMNS].drop_duplicates()
+    table = table[table['Exercise Intensity'].notna()]
+    order = np.arange(len(table))
+    sort = np.argsort(table['Exercise Intensity'].to_numpy(), kind='stable')
+    table = table.iloc[sort]
+
+    return {
+        'table': table,
+        'order': order[sort],
+        'intensity': table['Exercise Intensity'].to_numpy(),
+        'duration': table['Duration'].to_numpy(),
+        'calories': table['Calories Burned'].to_numpy(),
+    }
+
+
+def _exercise_positions(exercise_index, goal, fitness_level, bmi_category, k):
+    intensity = exercise_index['intensity']
+
+    if fitness_level == 'Beginner':
+        start, stop = 0, np.searchsorted(intensity, 4, side='right')
+    elif fitness_level == 'Intermediate':
+        start, stop = np.searchsorted(intensity, [4, 7], side='right')
+    else:
+        start, stop = np.searchsorted(intensity, 7, side='right'), len(intensity)
+
+    mask = np.ones(stop - start, dtype=bool)
+
+    duration = exercise_index['duration'][start:stop]
+    if goal == 'Loss':
+        mask &= duration >= 40
+    elif goal == 'Gain':
+        mask &= duration <= 40
+
+    calories = exercise_index['calories'][start:stop]
+    if bmi_category == 'Obese':
+        mask &= calories >= 300
+    elif bmi_category == 'Underweight':
+        mask &= calories <= 250
 
-def recommend_exercises(df, goal, fitness_level, bmi_category):
-    df_filtered = df.copy()
-    
+    positions = np.flatnonzero(mask) + start
+    order = exercise_index['order'][positions]
+    if len(positions) > k:
+        # Only the k earliest rows are returned, so skip sorting the rest
+        keep = np.argpartition(order, k - 1)[:k]
+        positions, order = positions[keep], order[keep]
+    return positions[np.argsort(order, kind='stable')]
+
+
+def _exercise_mask(df, goal, fitness_level, bmi_category):
+    # Boolean numpy mask, built on the raw column arrays
+    intensity = df['Exercise Intensity'].to_numpy()
     if fitness_level == 'Beginner':
-        df_filtered = df_filtered[df_filtered['Exercise Intensity'] <= 4]
+        mask = intensity <= 4
     elif fitness_level == 'Intermediate':
-        df_filtered = df_filtered[(df_filtered['Exercise Intensity'] > 4) & (df_filtered['Exercise Intensity'] <= 7)]
+        mask = (intensity > 4) & (intensity <= 7)
     else:
-        df_filtered = df_filtered[df_filtered['Exercise Intensity'] > 7]
+        mask = intensity > 7
 
+    duration = df['Duration'].to_numpy()
     if goal == 'Loss':
-        df_filtered = df_filtered[df_filtered['Duration'] >= 40]
+        mask &= duration >= 40
     elif goal == 'Gain':
-        df_filtered = df_filtered[df_filtered['Duration'] <= 40]
+        mask &= duration <= 40
 
+    calories = df['Calories Burned'].to_numpy()
     if bmi_category == 'Obese':
-        df_filtered = df_filtered[df_filtered['Calories Burned'] >= 300]
+        mask &= calories >= 300
     elif bmi_category == 'Underweight':
-        df_filtered = df_filtered[df_filtered['Calories Burned'] <= 250]
-    
-    return df_filtered[['Exercise', 'Calories Burned', 'Duration', 'Exercise Intensity', 'Heart Rate']].drop_duplicates().head(5)
+        mask &= calories <= 250
+
+    return mask
+
+
+def recommend_exercises(df, goal, fitness_level, bmi_category, exercise_index=None, k=5):
+    if exercise_index is not None:
+        positions = _exercise_positions(exercise_index, goal, fitness_level, bmi_category, k)
+        return exercise_index['table'].iloc[positions]
+
+    return _first_distinct(df, _exercise_mask(df, goal, fitness_level, bmi_category), EXERCISE_COLUMNS, k)
+
+
+def fallback_meals(df, goal, k=3):
+    fallback = df[df['Goal'] == goal].sort_values(by=['Protein (g)', 'Carbohydrates (g)'], ascending=[False, True]).drop_duplicates('Food_Item').head(k)
+    return fallback[MEAL_COLUMNS]
+
+
+def fallback_exercises(df, goal, k=3):
+    fallback = df[df['Goal'] == goal].sort_values(by='Calories Burned', ascending=False).drop_duplicates('Exercise').head(k)
+    return fallback[EXERCISE_COLUMNS]
+
+
+def _recommend_batch(profiles, key_columns, recommend):
+    # Run each distinct key once, then join the answers back onto every profile.
+    # Returns one row per (profile, rank); profiles with no match are absent.
+    answers = []
+    for key in profiles[key_columns].drop_duplicates().itertuples(index=False):
+        result = recommend(*key).reset_index(drop=True)
+        result.insert(0, 'rank', np.arange(1, len(result) + 1))
+        for column, value in zip(key_columns, key):
+            result.insert(0, column, value)
+        answers.append(result)
+
+    if not answers:
+        return pd.DataFrame(columns=['profile'] + key_columns + ['rank'])
+
+    answers = pd.concat(answers, ignore_index=True)
+    batch = profiles[key_columns].rename_axis('profile').reset_index()
+    batch = batch.merge(answers, on=key_columns, how='inner')
+    return batch.sort_values(['profile', 'rank'], kind='stable').reset_index(drop=True)
+
+
+def recommend_meals_batch(df, profiles, food_catalog=None, k=5):
+    # Ranked like the app's answer table (rank_meals), so pass the same foods:
+    # df = food_frame(tables), or its prebuilt food_catalog
+    if food_catalog is None:
+        food_catalog = build_food_catalog(df)
+    return _recommend_batch(
+        profiles, MEAL_PROFILE_KEY,
+        lambda goal, diet_type, meal_type: rank_meals(food_catalog, goal, diet_type, meal_type, k=k)
+    )
+
+
+def recommend_exercises_batch(df, profiles, exercise_index=None, k=5):
+    if exercise_index is None:
+        exercise_index = build_exercise_index(df)
+    return _recommend_batch(
+        profiles, EXERCISE_PROFILE_KEY,
+        lambda goal, fitness_level, bmi_category: recommend_exercises(df, goal, fitness_level, bmi_category, exercise_index=exercise_index, k=k)
+    )
+
+
+def build_answer_table(tables, checksum=None):
+    # The form only has a few hundred possible inputs, and meals/exercises each
+    # depend on just three of them, so every answer is computed ahead of time
+    # from the normalized tables (see dataset.py)
+    meals = meal_frame(tables)
+    exercises = exercise_frame(tables)
+    food_catalog = build_food_catalog(food_frame(tables))
+    exercise_index = build_exercise_index(exercises)
+
+    fallbacks = {}
+    for goal in GOALS:
+        fallbacks[goal] = {'meals': fallback_meals(meals, goal), 'exercises': fallback_exercises(exercises, goal)}
+
+    return {
+        'version': ANSWER_TABLE_VERSION,
+        'checksum': checksum,
+        'meals': {
+            key: rank_meals(food_catalog, *key)
+            for key in itertools.product(GOALS, DIET_TYPES, MEAL_TYPES)
+        },
+        'exercises': {
+            key: recommend_exercises(exercises, *key, exercise_index=exercise_index)
+            for key in itertools.product(GOALS, FITNESS_LEVELS, BMI_CATEGORIES)
+        },
+        'fallbacks': fallbacks,
+    }
+
+
+def update_answer_table(answers, tables, new_food_log, checksum=None):
+    # Fold newly ingested food log rows into an existing answer table instead
+    # of rebuilding it. The top k of (old foods + new foods) always lies within
+    # (old top k + new foods), so only those candidates are ranked again.
+    # Exercise answers do not depend on the food log and are kept as they are.
+    new_foods = new_food_log[['User_ID', 'food_id', 'Meal_Type']].merge(tables['food_catalog'], on='food_id', how='left')
+    for (goal, diet_type, meal_type), ranked in answers['meals'].items():
+        candidates = new_foods[new_foods['Meal_Type'] == meal_type][MEAL_COLUMNS]
+        if candidates.empty:
+            continue
+        candidates = pd.concat([ranked, candidates]).assign(Meal_Type=meal_type)
+        answers['meals'][goal, diet_type, meal_type] = rank_meals(build_food_catalog(candidates), goal, diet_type, meal_type)
+
+    profiles = tables['user_profile'][['User_ID', 'Goal']].drop_duplicates()
+    new_meals = new_foods.merge(profiles, on='User_ID', how='inner')
+    for goal, fallback in answers['fallbacks'].items():
+        candidates = new_meals[new_meals['Goal'] == goal][MEAL_COLUMNS]
+        if candidates.empty:
+            continue
+        candidates = pd.concat([fallback['meals'], candidates]).assign(Goal=goal)
+        fallback['meals'] = fallback_meals(candidates, goal)
+
+    answers['checksum'] = checksum
+    return answers
+
+
+def save_answer_table(answers, path):
+    tmp_path = path + '.tmp'
+    joblib.dump(answers, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def load_answer_table(path, checksum=None):
+    # Returns None when the artifact is missing, was written by an older
+    # build_answer_table, or was built from different data
+    if not os.path.exists(path):
+        return None
+    answers = joblib.load(path)
+    if answers.get('version') != ANSWER_TABLE_VERSION:
+        return None
+    if checksum is not None and answers.get('checksum') != checksum:
+        return None
+    return answers
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build the precomputed recommendation answer table.")
+    parser.add_argument('store_dir', nargs='?', default=STORE_DIR)
+    parser.add_argument('output', nargs='?', default=ANSWERS_PATH)
+    args = parser.parse_args()
+
+    answers = build_answer_table(load_tables(directory=args.store_dir), tables_checksum(args.store_dir))
+    save_answer_table(answers, args.output)
+    print(f"Wrote {len(answers['meals'])} meal and {len(answers['exercises'])} exercise answers to {args.output}")